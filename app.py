@@ -13,25 +13,39 @@ StreamlitベースのMV制作自動化パイプラインアプリケーション
 """
 
 import os
-import sys
+import atexit
+import functools
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from pathlib import Path
 import threading
 import time
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
-import google.generativeai as genai
-import pandas as pd
+import queue
+import re
+import collections
+import hashlib
+import shutil
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from datetime import datetime
 import json
+from typing import List, Optional
 
 # ローカルモジュールのインポート
 from media_processor import MediaProcessor
-from prompt_generator import PromptGenerator
 from character_manager import CharacterManager
 from prompt_dialogs import SunoPromptDialog, ImagePromptDialog, VideoPromptDialog, CharacterImageDialog
 from prompt_history import PromptHistory
-from PIL import Image
+from json_utils import dump_json
+
+# 重いモジュール（google.generativeai、watchdog.observers）は使用箇所で遅延インポートする
+try:
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    # watchdog未インストール時は自動処理（フォルダ監視）のみ使用不可
+    class FileSystemEventHandler:
+        pass
 
 # プロジェクトのベースパス
 BASE_DIR = Path(r"C:\MVAI")
@@ -39,6 +53,11 @@ BASE_DIR = Path(r"C:\MVAI")
 # API Key保存ファイルのパス
 API_KEY_FILE = BASE_DIR / ".api_key.json"
 
+# サムネイルのキャッシュフォルダ
+THUMBNAIL_CACHE_DIR = BASE_DIR / ".thumb_cache"
+# サムネイルグリッドの表示幅（px、生成時の幅と同じにして縮小表示用の余分な転送をしない）
+THUMBNAIL_DISPLAY_WIDTH = MediaProcessor.THUMBNAIL_WIDTH
+
 # 必要なフォルダの定義
 REQUIRED_FOLDERS = [
     "00_キャラクター",
@@ -53,13 +72,35 @@ REQUIRED_FOLDERS = [
     "99_Logs"
 ]
 
+# 対応ファイル拡張子
+_VALID_AUDIO_EXT = frozenset({'.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg', '.wma'})
+_VALID_VIDEO_EXT = frozenset({'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v'})
+
+# 監視対象フォルダ → (対応拡張子, 種別名)
+# 対応拡張子がNoneのフォルダは拡張子チェックを行わない
+_FOLDER_VALID_EXT = {
+    "01_曲_Input": (_VALID_AUDIO_EXT, "音声"),
+    "02_元動画_Sora": (_VALID_VIDEO_EXT, "動画"),
+    "04_AI動画_生成中": (None, None),
+    "05_動画_高品質化": (None, None),
+    "06_動画_口パク": (None, None)
+}
+
+# 監視対象フォルダのフルパス（文字列）→ フォルダ名（イベントごとのPath生成を避けるため事前計算）
+_WATCHED_DIRS = {os.fspath(BASE_DIR / name): name for name in _FOLDER_VALID_EXT}
+
 # セッション状態の初期化
 if 'api_key_set' not in st.session_state:
     st.session_state.api_key_set = False
 if 'observer' not in st.session_state:
     st.session_state.observer = None
+if 'event_handler' not in st.session_state:
+    st.session_state.event_handler = None
+if 'watchdog_atexit' not in st.session_state:
+    st.session_state.watchdog_atexit = None
 if 'processing_logs' not in st.session_state:
-    st.session_state.processing_logs = []
+    # 最新100件を保持（古いものから自動的に破棄）
+    st.session_state.processing_logs = collections.deque(maxlen=100)
 if 'watchdog_running' not in st.session_state:
     st.session_state.watchdog_running = False
 if 'show_api_input' not in st.session_state:
@@ -68,15 +109,316 @@ if 'show_api_input' not in st.session_state:
 
 def create_folders():
     """必要なフォルダを自動作成"""
+    # BASE_DIRを1回だけ走査して既存フォルダを確認
+    try:
+        with os.scandir(BASE_DIR) as entries:
+            existing = {entry.name for entry in entries if entry.is_dir()}
+    except FileNotFoundError:
+        existing = set()
+    
     created_folders = []
     for folder in REQUIRED_FOLDERS:
-        folder_path = BASE_DIR / folder
-        if not folder_path.exists():
-            folder_path.mkdir(parents=True, exist_ok=True)
+        if folder not in existing:
+            (BASE_DIR / folder).mkdir(parents=True, exist_ok=True)
             created_folders.append(folder)
     return created_folders
 
 
+@st.cache_resource
+def get_character_manager():
+    """キャラクター管理オブジェクトを取得（再実行をまたいで再利用）"""
+    return CharacterManager(BASE_DIR)
+
+
+@st.cache_resource
+def get_prompt_history():
+    """プロンプト履歴管理オブジェクトを取得（再実行をまたいで再利用）"""
+    return PromptHistory(BASE_DIR)
+
+
+@st.cache_resource
+def get_media_processor():
+    """メディア処理オブジェクトを取得（再実行をまたいで再利用、フォルダ作成は初回のみ）"""
+    return MediaProcessor(BASE_DIR, add_log)
+
+
+def _file_mtime_ns(path: Path) -> int:
+    """ファイルの更新時刻（ナノ秒）を取得（存在しない場合は0）"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+@st.cache_data
+def _load_history_cached(mtime_ns: int):
+    """プロンプト履歴を読み込む（ファイルの更新時刻が変わるまでキャッシュ）"""
+    return get_prompt_history().load_history()
+
+
+@st.cache_data
+def _load_favorites_cached(mtime_ns: int):
+    """お気に入りを読み込む（ファイルの更新時刻が変わるまでキャッシュ）"""
+    return get_prompt_history().load_favorites()
+
+
+@st.cache_data
+def _get_character_list_cached(mtime_ns: int):
+    """キャラクター名のリストを取得（メタデータの更新時刻が変わるまでキャッシュ）"""
+    return get_character_manager().get_character_list()
+
+
+def _thumbnail_cache_path(video_file: Path, file_stat: Optional[tuple] = None) -> Path:
+    """
+    動画ファイルに対応するサムネイルキャッシュのパス（パス・更新時刻・サイズ・表示幅から算出）
+    
+    file_statに一覧取得時の(サイズ, 更新時刻ns)を渡すと、stat()を呼び出さずに算出します。
+    """
+    if file_stat is None:
+        stat = video_file.stat()
+        file_stat = (stat.st_size, stat.st_mtime_ns)
+    size, mtime_ns = file_stat
+    key = hashlib.blake2b(
+        f"{video_file}|{mtime_ns}|{size}|{THUMBNAIL_DISPLAY_WIDTH}".encode("utf-8")
+    ).hexdigest()[:16]
+    return THUMBNAIL_CACHE_DIR / f"{key}.jpg"
+
+
+@st.cache_resource
+def _thumbnail_locks():
+    """
+    サムネイルのキャッシュパスごとのロック（再実行・セッションをまたいで共有）
+    
+    Returns:
+        (辞書の操作用ロック, キャッシュパス→ロックの辞書（使用中のロックのみ保持）)
+    """
+    return threading.Lock(), weakref.WeakValueDictionary()
+
+
+def _thumbnail_lock(cache_path: Path) -> threading.Lock:
+    """キャッシュパスに対応するロックを取得"""
+    guard, locks = _thumbnail_locks()
+    with guard:
+        lock = locks.get(cache_path)
+        if lock is None:
+            lock = locks[cache_path] = threading.Lock()
+        return lock
+
+
+def _cached_thumbnail(media_processor, video_file: Path, file_stat: Optional[tuple] = None) -> Optional[Path]:
+    """
+    サムネイルを取得（ディスクキャッシュがあればそれを返し、なければ生成してキャッシュ）
+    
+    同じ動画のサムネイルを先読みのスレッドと表示処理から同時に生成しないよう、
+    キャッシュパスごとのロックを保持して生成します（後から呼び出した側は生成済みのキャッシュを返す）。
+    
+    Args:
+        media_processor: サムネイル生成に使用するMediaProcessor
+        video_file: 動画ファイルのパス
+        file_stat: 一覧取得時の(サイズ, 更新時刻ns)（省略時はstat()で取得）
+    
+    Returns:
+        サムネイル画像のパス、またはNone
+    """
+    cache_path = _thumbnail_cache_path(video_file, file_stat)
+    try:
+        if cache_path.stat().st_size > 0:
+            return cache_path
+    except FileNotFoundError:
+        pass
+    
+    with _thumbnail_lock(cache_path):
+        # ロックを待つ間に他のスレッドが生成した場合はそれを使う
+        try:
+            if cache_path.stat().st_size > 0:
+                return cache_path
+        except FileNotFoundError:
+            pass
+        
+        thumbnail_path = media_processor.generate_thumbnail(video_file, width=THUMBNAIL_DISPLAY_WIDTH)
+        if not thumbnail_path:
+            return None
+        
+        THUMBNAIL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(thumbnail_path, cache_path)
+        except OSError:
+            # 一時フォルダが別ドライブの場合
+            shutil.move(str(thumbnail_path), str(cache_path))
+        return cache_path
+
+
+def _thumbnail_cached(video_file: Path, file_stat: Optional[tuple] = None) -> bool:
+    """サムネイルのディスクキャッシュが既に存在するかどうか"""
+    try:
+        return _thumbnail_cache_path(video_file, file_stat).stat().st_size > 0
+    except OSError:
+        return False
+
+
+def _prefetch_thumbnails(media_processor, video_files: List[Path], file_stats: Optional[dict] = None,
+                         timeout: float = 60.0):
+    """
+    キャッシュのないサムネイルを並列に生成（ffmpegの起動とデコードを重ねる）
+    
+    Args:
+        media_processor: サムネイル生成に使用するMediaProcessor
+        video_files: 動画ファイルのリスト
+        file_stats: 動画ファイル→一覧取得時の(サイズ, 更新時刻ns)の辞書
+        timeout: 待機する最大秒数（超えた分はバックグラウンドで生成を続ける）
+    """
+    file_stats = file_stats or {}
+    missing = [f for f in video_files if not _thumbnail_cached(f, file_stats.get(f))]
+    if not missing:
+        return
+    
+    executor = ThreadPoolExecutor(
+        max_workers=min(8, os.cpu_count() or 1, len(missing)),
+        thread_name_prefix="mvai-thumb",
+    )
+    try:
+        futures = [executor.submit(_cached_thumbnail, media_processor, f, file_stats.get(f)) for f in missing]
+        with st.spinner(f"サムネイルを生成中...（{len(missing)}件）"):
+            wait(futures, timeout=timeout)
+    finally:
+        executor.shutdown(wait=False)
+
+
+@st.cache_resource
+def _ffmpeg():
+    """ffmpeg-pythonモジュールを取得（初回のみインポート）"""
+    import ffmpeg
+    return ffmpeg
+
+
+def _probe_minimal(path_str: str) -> dict:
+    """
+    コンテナ情報のみから動画情報を取得（フレームのデコードやカウントは行わない）
+    
+    最初の映像ストリームの幅・高さ・コーデックと、フォーマットの長さ・サイズ・ビットレートのみを要求します。
+    """
+    return _ffmpeg().probe(
+        path_str,
+        v='error',
+        select_streams='v:0',
+        show_entries='stream=codec_type,codec_name,width,height:format=duration,size,bit_rate',
+    )
+
+
+@st.cache_data(show_spinner=False)
+def _probe_cached(path_str: str, mtime_ns: int, size: int) -> dict:
+    """動画情報を取得（パス・更新時刻・サイズが同じ間はキャッシュ）"""
+    return _probe_minimal(path_str)
+
+
+def _probe_file(file_path: Path, file_stat: Optional[tuple] = None) -> dict:
+    """
+    ファイルの更新時刻とサイズをキーにしてキャッシュ付きで動画情報を取得
+    
+    file_statに一覧取得時の(サイズ, 更新時刻ns)を渡すと、stat()を呼び出さずにキーを作成します。
+    """
+    if file_stat is None:
+        stat = file_path.stat()
+        file_stat = (stat.st_size, stat.st_mtime_ns)
+    size, mtime_ns = file_stat
+    return _probe_cached(str(file_path), mtime_ns, size)
+
+
+@st.cache_data(show_spinner=False)
+def _load_beat_data_cached(_media_processor, audio_str: str, csv_mtime_ns: int) -> Optional[dict]:
+    """ビートデータを読み込む（ビートデータCSVの更新時刻が変わるまでキャッシュ）"""
+    return _media_processor.load_beat_data(Path(audio_str))
+
+
+def _load_beat_data(media_processor, audio_path: Path) -> Optional[dict]:
+    """ビートデータCSVの更新時刻をキーにしてキャッシュ付きでビートデータを取得"""
+    return _load_beat_data_cached(
+        media_processor, str(audio_path), _file_mtime_ns(media_processor.beat_csv_path(audio_path))
+    )
+
+
+def _walk_files(folder: str, extensions) -> List[tuple]:
+    """
+    os.scandirでフォルダを再帰的に走査し、指定した拡張子のファイルを返す
+    
+    サイズと更新時刻は走査時のDirEntry.stat()から取得するため、表示時にstat()を呼び直す必要はありません。
+    
+    Args:
+        folder: 走査するフォルダのパス
+        extensions: 対象とする拡張子（小文字、ドット付き）
+    
+    Returns:
+        (ファイルパス, サイズ, 更新時刻ns)のパス順ソート済みリスト
+    """
+    # 拡張子はドットなしの小文字で比較し、エントリごとにPathや拡張子文字列を作らない
+    exts = frozenset(ext.lstrip('.').lower() for ext in extensions)
+    max_ext_len = max((len(ext) for ext in exts), default=0)
+    results = []
+    stack = [folder]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    # 隠しファイル（処理中の出力の一時ファイルなど）は対象外
+                    if entry.name.startswith('.'):
+                        continue
+                    _, dot, ext = entry.name.rpartition('.')
+                    if not dot or len(ext) > max_ext_len or ext.lower() not in exts:
+                        continue
+                    if entry.is_file():
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            # 走査中に移動・削除されたファイル
+                            continue
+                        results.append((entry.path, stat.st_size, stat.st_mtime_ns))
+        except (FileNotFoundError, PermissionError):
+            continue
+    return sorted(results)
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _list_videos(folder: str, extensions: tuple = tuple(sorted(_VALID_VIDEO_EXT))) -> List[tuple]:
+    """フォルダ内の動画ファイル一覧を取得（サブフォルダも含む、30秒間キャッシュ）"""
+    return _walk_files(folder, extensions)
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _list_audio(folder: str, extensions: tuple = ('.mp3', '.wav')) -> List[tuple]:
+    """フォルダ内の音声ファイル一覧を1回の走査で取得（サブフォルダも含む、30秒間キャッシュ）"""
+    return _walk_files(folder, extensions)
+
+
+@st.cache_data(ttl=15, show_spinner=False)
+def _count_entries(folder: str) -> tuple:
+    """
+    フォルダ内のファイル数とフォルダ数を1回の走査で数える（サブフォルダも含む、15秒間キャッシュ）
+    
+    Returns:
+        (ファイル数, フォルダ数)
+    """
+    file_count = 0
+    dir_count = 0
+    stack = [folder]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        dir_count += 1
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        file_count += 1
+        except (FileNotFoundError, PermissionError):
+            continue
+    return file_count, dir_count
+
+
 def load_api_key():
     """保存されたAPI Keyを読み込む"""
     if API_KEY_FILE.exists():
@@ -93,8 +435,7 @@ def save_api_key(api_key: str):
     """API Keyをファイルに保存"""
     try:
         data = {'api_key': api_key}
-        with open(API_KEY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f)
+        dump_json(data, API_KEY_FILE, indent=False)
         # ファイルの権限を制限（可能な場合）
         if hasattr(os, 'chmod'):
             try:
@@ -111,6 +452,7 @@ def save_api_key(api_key: str):
 def setup_gemini_api(api_key: str):
     """Gemini APIの設定"""
     try:
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
         os.environ['GEMINI_API_KEY'] = api_key
         # API Keyを保存
@@ -121,18 +463,109 @@ def setup_gemini_api(api_key: str):
         return False
 
 
+def _reserve_output_path(folder: Path, stem: str, suffix: str) -> Path:
+    """
+    出力ファイル名を確保する
+    
+    O_CREAT|O_EXCLで空ファイルを作成して名前を予約するため、存在確認と作成の間に
+    他の処理が同名ファイルを作成しても衝突しません。同名ファイルが存在する場合は
+    `_xxxxxx`（ランダムな6桁の16進数）を付けます。
+    
+    Args:
+        folder: 出力先フォルダ
+        stem: ファイル名（拡張子なし）
+        suffix: 拡張子（ドット付き）
+    
+    Returns:
+        予約した出力ファイルのパス
+    """
+    folder.mkdir(parents=True, exist_ok=True)
+    output_path = folder / f"{stem}{suffix}"
+    while True:
+        try:
+            fd = os.open(output_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            output_path = folder / f"{stem}_{uuid.uuid4().hex[:6]}{suffix}"
+            continue
+        os.close(fd)
+        return output_path
+
+
+def _discard_reserved_path(path: Path):
+    """_reserve_output_pathで予約したまま空のファイルを削除"""
+    try:
+        if path.stat().st_size == 0:
+            path.unlink()
+    except OSError:
+        pass
+
+
+# ログ種別ごとの表示アイコン
+_LOG_ICONS = {"SUCCESS": "✅", "ERROR": "❌", "WARNING": "⚠️", "INFO": "ℹ️"}
+
+_MARKDOWN_SPECIAL = re.compile(r'([\\`*_{}\[\]()#+\-.!|<>~])')
+
+
+def _escape_markdown(text: str) -> str:
+    """Markdownの記号をエスケープ（ファイル名の_や*が書式として解釈されないように）"""
+    return _MARKDOWN_SPECIAL.sub(r'\\\1', str(text))
+
+
+def _fmt_ts(timestamp_ns: int) -> str:
+    """ログのタイムスタンプ（ナノ秒）を表示用の文字列に変換"""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp_ns // 1_000_000_000))
+
+
 def add_log(message: str, log_type: str = "INFO"):
-    """処理ログを追加"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    """処理ログを追加（時刻の整形は表示時に行う）"""
     log_entry = {
-        "timestamp": timestamp,
+        "timestamp_ns": time.time_ns(),
         "type": log_type,
         "message": message
     }
     st.session_state.processing_logs.append(log_entry)
-    # ログが多すぎる場合は古いものを削除（最新100件を保持）
-    if len(st.session_state.processing_logs) > 100:
-        st.session_state.processing_logs = st.session_state.processing_logs[-100:]
+
+
+def _is_remote_drive(path: Path) -> bool:
+    """パスがネットワークドライブ上にあるかを判定（Windowsのみ）"""
+    if os.name != 'nt':
+        return False
+    try:
+        import ctypes
+        DRIVE_REMOTE = 4
+        return ctypes.windll.kernel32.GetDriveTypeW(path.anchor) == DRIVE_REMOTE
+    except Exception:
+        return False
+
+
+def _create_observer():
+    """
+    監視用のObserverを生成
+    
+    ローカルディスクではイベント駆動のObserver（ReadDirectoryChangesW/inotify）を使用し、
+    ネットワークドライブの場合のみ長めの間隔のPollingObserverを使用する
+    """
+    from watchdog.observers import Observer
+    from watchdog.observers.polling import PollingObserver
+    
+    if _is_remote_drive(BASE_DIR):
+        add_log("ネットワークドライブのため、ポーリング監視（30秒間隔）を使用します", "WARNING")
+        return PollingObserver(timeout=30)
+    
+    try:
+        return Observer()
+    except Exception as e:
+        add_log(f"イベント駆動の監視を利用できないため、ポーリング監視を使用します: {str(e)}", "WARNING")
+        return PollingObserver(timeout=30)
+
+
+def _shutdown_watchdog(observer, event_handler):
+    """監視スレッドを停止（プロセス終了時にも呼ばれる）"""
+    try:
+        observer.stop()
+        event_handler.stop()
+    except Exception:
+        pass
 
 
 def start_watchdog():
@@ -141,20 +574,23 @@ def start_watchdog():
         return
     
     try:
-        media_processor = MediaProcessor(BASE_DIR, add_log)
+        media_processor = get_media_processor()
         event_handler = MediaFileHandler(media_processor)
         
-        observer = Observer()
+        observer = _create_observer()
         
-        # 監視対象フォルダを追加
-        observer.schedule(event_handler, str(BASE_DIR / "01_曲_Input"), recursive=False)
-        observer.schedule(event_handler, str(BASE_DIR / "02_元動画_Sora"), recursive=False)
-        observer.schedule(event_handler, str(BASE_DIR / "04_AI動画_生成中"), recursive=False)
-        observer.schedule(event_handler, str(BASE_DIR / "05_動画_高品質化"), recursive=False)
-        observer.schedule(event_handler, str(BASE_DIR / "06_動画_口パク"), recursive=False)
+        # BASE_DIR直下を1つの再帰ウォッチで監視（対象フォルダの振り分けはハンドラー側で行う）
+        observer.schedule(event_handler, os.fspath(BASE_DIR), recursive=True)
         
+        # セッションが終了しても終了処理をブロックしないようデーモンスレッドにする
+        observer.daemon = True
         observer.start()
         st.session_state.observer = observer
+        st.session_state.event_handler = event_handler
+        # stop_watchdogが呼ばれずにプロセスが終了する場合に備えて停止処理を登録
+        shutdown = functools.partial(_shutdown_watchdog, observer, event_handler)
+        atexit.register(shutdown)
+        st.session_state.watchdog_atexit = shutdown
         st.session_state.watchdog_running = True
         add_log("Watchdog監視を開始しました", "SUCCESS")
     except Exception as e:
@@ -168,151 +604,213 @@ def stop_watchdog():
             st.session_state.observer.stop()
             st.session_state.observer.join()
             st.session_state.observer = None
+            if st.session_state.event_handler:
+                st.session_state.event_handler.stop()
+                st.session_state.event_handler = None
+            if st.session_state.watchdog_atexit:
+                atexit.unregister(st.session_state.watchdog_atexit)
+                st.session_state.watchdog_atexit = None
             st.session_state.watchdog_running = False
             add_log("Watchdog監視を停止しました", "INFO")
         except Exception as e:
             add_log(f"Watchdogの停止に失敗しました: {str(e)}", "ERROR")
 
 
+def _wait_stable(file_path: Path, interval: float = 0.1, stable_for: float = 1.5,
+                 max_wait: float = 30) -> bool:
+    """
+    ファイルサイズが安定する（書き込みが完了する）まで待機
+    
+    サイズと更新時刻がstable_for秒間変わらなければ書き込み完了とみなします。
+    ffmpegは先読みやfaststartの書き直しの間しばらくサイズが変わらないことがあるため、
+    短い間隔の2回の確認だけでは判定しません。サイズが増え続けている間は時間に関係なく
+    待機するため、コピーに時間がかかる大きなファイルも書き込み完了後に処理されます。
+    
+    Args:
+        file_path: 対象ファイルのパス
+        interval: サイズを確認する間隔（秒）
+        stable_for: 書き込み完了とみなすまでサイズ・更新時刻が変わらない時間（秒）
+        max_wait: 空のファイルに書き込みが始まるのを待つ最大時間（秒）
+    
+    Returns:
+        サイズが安定した場合True、ファイルが消えた場合False
+    """
+    last_state = None
+    changed_at = time.monotonic()
+    deadline = changed_at + max_wait
+    while True:
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return False
+        now = time.monotonic()
+        state = (stat.st_size, stat.st_mtime_ns)
+        if state != last_state:
+            last_state = state
+            changed_at = now
+        elif now - changed_at >= stable_for and (stat.st_size > 0 or now >= deadline):
+            return True
+        time.sleep(interval)
+
+
 class MediaFileHandler(FileSystemEventHandler):
     """ファイルシステムイベントハンドラー"""
     
+    # 処理済みファイルとして記録する最大件数（古いものから破棄）
+    _MAX_SEEN = 4096
+    
+    # 同じフォルダへのファイル追加をまとめる待機時間（秒）
+    DEBOUNCE_SECONDS = 0.5
+    
     def __init__(self, media_processor):
         super().__init__()
         self.media_processor = media_processor
-        self.processed_files = set()
+        # (パス, 更新時刻, サイズ) をキーにしたLRU（上書きされたファイルは再処理される）
+        self.processed_files = collections.OrderedDict()
+        # デバウンス期間中に追加されたファイル（フォルダごと）とそのタイマー
+        self._pending = collections.defaultdict(list)
+        self._timers = {}
+        self._lock = threading.Lock()
+        # イベントスレッドをブロックしないよう、書き込み完了待ちはワーカースレッドで行う
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._worker_loop, daemon=True)
+        self._worker.start()
+        # 処理はファイルごとにスレッドを作らず、上限付きのスレッドプールで実行
+        self.pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="mvai-io")
+    
+    def stop(self):
+        """タイマー、ワーカースレッド、スレッドプールを停止"""
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+            self._pending.clear()
+        self._queue.put(None)
+        self.pool.shutdown(wait=False)
     
     def on_created(self, event):
-        """ファイル作成時の処理"""
+        """ファイル作成時の処理（デバウンス用に溜めて即座に戻る）"""
         try:
             if event.is_directory:
                 return
-            
-            file_path = Path(event.src_path)
-            
-            # 重複処理を防ぐ
-            if str(file_path) in self.processed_files:
-                return
-            
-            # ファイルが完全に書き込まれるまで待機
-            time.sleep(1)
-            
-            if not file_path.exists():
-                return
-            
-            # ファイル拡張子のチェック（対応していないファイルはスキップ）
-            valid_audio_extensions = {'.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg', '.wma'}
-            valid_video_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v'}
-            
-            file_ext = file_path.suffix.lower()
-            parent_folder = file_path.parent.name
-            
-            # 対応していないファイル形式はスキップ
-            if parent_folder == "01_曲_Input" and file_ext not in valid_audio_extensions:
-                self.media_processor.log_callback(
-                    f"対応していない音声ファイル形式です: {file_path.name} ({file_ext})",
-                    "ERROR"
-                )
-                return
-            
-            if parent_folder == "02_元動画_Sora" and file_ext not in valid_video_extensions:
-                self.media_processor.log_callback(
-                    f"対応していない動画ファイル形式です: {file_path.name} ({file_ext})",
-                    "ERROR"
-                )
-                return
-            
-            self.processed_files.add(str(file_path))
-            
-            # フォルダに応じた処理を実行
-            if parent_folder == "01_曲_Input":
-                threading.Thread(
-                    target=self._safe_process_audio,
-                    args=(file_path,),
-                    daemon=True
-                ).start()
-            elif parent_folder == "02_元動画_Sora":
-                threading.Thread(
-                    target=self._safe_process_video,
-                    args=(file_path,),
-                    daemon=True
-                ).start()
-            elif parent_folder == "04_AI動画_生成中":
-                threading.Thread(
-                    target=self._safe_trigger_quality,
-                    args=(file_path,),
-                    daemon=True
-                ).start()
-            elif parent_folder == "05_動画_高品質化":
-                threading.Thread(
-                    target=self._safe_process_lipsync,
-                    args=(file_path,),
-                    daemon=True
-                ).start()
-            elif parent_folder == "06_動画_口パク":
-                threading.Thread(
-                    target=self._safe_finalize_assets,
-                    args=(file_path,),
-                    daemon=True
-                ).start()
+            self._enqueue(event.src_path)
         except Exception as e:
-            # エラーをログに記録（log_callbackが利用可能な場合）
-            try:
-                if hasattr(self, 'media_processor') and self.media_processor:
-                    self.media_processor.log_callback(
-                        f"ファイル処理エラー: {str(e)}",
-                        "ERROR"
-                    )
-            except:
-                pass  # ログ記録も失敗した場合は無視
+            self._log_error(e)
     
-    def _safe_process_audio(self, file_path: Path):
-        """音声処理の安全なラッパー"""
+    def on_moved(self, event):
+        """
+        ファイル移動時の処理
+        
+        処理中の出力は隠しファイルに書き込まれ、ハードリンクに対応しないドライブでは
+        完了後に名前の変更で最終的な名前になるため、その場合のみ作成と同様に扱う。
+        """
         try:
-            self.media_processor.process_audio_file(file_path)
+            if event.is_directory or not os.path.basename(event.src_path).startswith('.'):
+                return
+            self._enqueue(event.dest_path)
         except Exception as e:
-            self.media_processor.log_callback(
-                f"音声処理で予期しないエラーが発生しました ({file_path.name}): {str(e)}",
-                "ERROR"
-            )
+            self._log_error(e)
     
-    def _safe_process_video(self, file_path: Path):
-        """動画処理の安全なラッパー"""
-        try:
-            self.media_processor.process_video_file(file_path)
-        except Exception as e:
-            self.media_processor.log_callback(
-                f"動画処理で予期しないエラーが発生しました ({file_path.name}): {str(e)}",
-                "ERROR"
-            )
+    def _enqueue(self, path: str):
+        """処理対象のファイルをデバウンス用に溜める"""
+        # 監視対象フォルダ直下のファイルのみ処理（使用済み素材などのサブフォルダは対象外）
+        parent_folder = _WATCHED_DIRS.get(os.path.dirname(path))
+        if parent_folder is None:
+            return
+        
+        # 隠しファイル（処理中の出力の一時ファイルなど）は対象外
+        if os.path.basename(path).startswith('.'):
+            return
+        
+        file_path = Path(path)
+        
+        # 同じフォルダへの追加が続く間はタイマーを延長し、まとめて処理する
+        with self._lock:
+            self._pending[parent_folder].append(file_path)
+            timer = self._timers.get(parent_folder)
+            if timer:
+                timer.cancel()
+            timer = threading.Timer(self.DEBOUNCE_SECONDS, self._flush, args=(parent_folder,))
+            timer.daemon = True
+            self._timers[parent_folder] = timer
+            timer.start()
+    
+    def _flush(self, parent_folder: str):
+        """デバウンス期間が終了したフォルダのファイルをワーカーに渡す"""
+        with self._lock:
+            file_paths = self._pending.pop(parent_folder, [])
+            self._timers.pop(parent_folder, None)
+        if file_paths:
+            self._queue.put((parent_folder, file_paths))
     
-    def _safe_trigger_quality(self, file_path: Path):
-        """高品質化トリガーの安全なラッパー"""
+    def _worker_loop(self):
+        """キューからファイルを取り出し、書き込み完了後にまとめて処理を振り分ける"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            parent_folder, file_paths = item
+            try:
+                accepted = []
+                for file_path in dict.fromkeys(file_paths):
+                    # ファイルが完全に書き込まれるまで待機
+                    if not _wait_stable(file_path):
+                        continue
+                    
+                    if self._accept(file_path, parent_folder):
+                        accepted.append(file_path)
+                
+                if accepted:
+                    self.pool.submit(self._safe_process_batch, parent_folder, accepted)
+            except Exception as e:
+                self._log_error(e)
+    
+    def _accept(self, file_path: Path, parent_folder: str) -> bool:
+        """重複・非対応形式を除外し、処理対象ならTrueを返す"""
+        # 重複処理を防ぐ
         try:
-            self.media_processor.trigger_quality_pipeline(file_path)
-        except Exception as e:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return False
+        key = (str(file_path), stat.st_mtime_ns, stat.st_size)
+        if key in self.processed_files:
+            self.processed_files.move_to_end(key)
+            return False
+        
+        valid_extensions, kind = _FOLDER_VALID_EXT[parent_folder]
+        
+        # 対応していないファイル形式はスキップ
+        file_ext = file_path.suffix.lower()
+        if valid_extensions is not None and file_ext not in valid_extensions:
             self.media_processor.log_callback(
-                f"高品質化パイプラインで予期しないエラーが発生しました ({file_path.name}): {str(e)}",
+                f"対応していない{kind}ファイル形式です: {file_path.name} ({file_ext})",
                 "ERROR"
             )
+            return False
+        
+        self.processed_files[key] = None
+        if len(self.processed_files) > self._MAX_SEEN:
+            self.processed_files.popitem(last=False)
+        return True
     
-    def _safe_process_lipsync(self, file_path: Path):
-        """リップシンク処理の安全なラッパー"""
+    def _log_error(self, e: Exception):
+        """エラーをログに記録（log_callbackが利用可能な場合）"""
         try:
-            self.media_processor.process_lipsync(file_path)
-        except Exception as e:
-            self.media_processor.log_callback(
-                f"リップシンク処理で予期しないエラーが発生しました ({file_path.name}): {str(e)}",
-                "ERROR"
-            )
+            if hasattr(self, 'media_processor') and self.media_processor:
+                self.media_processor.log_callback(
+                    f"ファイル処理エラー: {str(e)}",
+                    "ERROR"
+                )
+        except:
+            pass  # ログ記録も失敗した場合は無視
     
-    def _safe_finalize_assets(self, file_path: Path):
-        """最終処理の安全なラッパー"""
+    def _safe_process_batch(self, parent_folder: str, file_paths: list):
+        """フォルダ単位の一括処理の安全なラッパー"""
         try:
-            self.media_processor.finalize_assets(file_path)
+            self.media_processor.process_batch(parent_folder, file_paths)
         except Exception as e:
             self.media_processor.log_callback(
-                f"最終処理で予期しないエラーが発生しました ({file_path.name}): {str(e)}",
+                f"一括処理で予期しないエラーが発生しました ({parent_folder}): {str(e)}",
                 "ERROR"
             )
 
@@ -346,9 +844,9 @@ def main():
         if st.session_state.api_key_set or existing_key:
             st.success("✅ API Key: 設定済み")
             if st.button("🔑 API Keyを変更", key="change_api_key"):
+                # 入力欄は同じ描画内で下に表示されるため、再実行は不要
                 st.session_state.show_api_input = True
                 st.session_state.api_key_set = False
-                st.rerun()
         else:
             st.session_state.show_api_input = True
         
@@ -382,8 +880,8 @@ def main():
         if st.button("キャラクターを追加"):
             st.session_state.show_character_upload = True
         
-        character_manager = CharacterManager(BASE_DIR)
-        characters = character_manager.get_character_list()
+        character_manager = get_character_manager()
+        characters = _get_character_list_cached(_file_mtime_ns(character_manager.metadata_file))
         if characters:
             st.write(f"登録済み: {len(characters)}人")
             for char in characters:
@@ -394,7 +892,11 @@ def main():
         if st.session_state.get('show_character_upload', False):
             st.divider()
             st.subheader("キャラクターを追加")
-            uploaded_file = st.file_uploader("キャラクター画像をアップロード", type=['png', 'jpg', 'jpeg'])
+            uploaded_files = st.file_uploader(
+                "キャラクター画像をアップロード（複数選択可）",
+                type=['png', 'jpg', 'jpeg'],
+                accept_multiple_files=True
+            )
             char_name = st.text_input("キャラクター名を入力")
             
             col1, col2 = st.columns(2)
@@ -404,18 +906,12 @@ def main():
                     st.rerun()
             with col2:
                 if st.button("追加", type="primary"):
-                    if uploaded_file and char_name:
-                        # 一時ファイルに保存
-                        import tempfile
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(uploaded_file.name).suffix) as tmp:
-                            tmp.write(uploaded_file.getvalue())
-                            tmp_path = Path(tmp.name)
-                        
-                        result_path = character_manager.add_character(char_name, tmp_path, uploaded_file)
-                        if result_path:
-                            st.success(f"✅ {char_name}を追加しました")
+                    if uploaded_files and char_name:
+                        # 複数画像をまとめて追加（メタデータの保存は1回のみ）
+                        result_paths = character_manager.add_characters_bulk(char_name, uploaded_files)
+                        if result_paths:
+                            st.success(f"✅ {char_name}を追加しました（{len(result_paths)}枚）")
                             st.session_state.show_character_upload = False
-                            tmp_path.unlink()  # 一時ファイルを削除
                             st.rerun()
                         else:
                             st.error("❌ 追加に失敗しました")
@@ -451,17 +947,18 @@ def main():
                     start_watchdog()
                     st.rerun()
         else:
-            # 自動処理が無効な場合は監視を停止
+            # 自動処理が無効な場合は監視を停止（チェックボックスの変更で既に再描画中のため再実行しない）
             if st.session_state.watchdog_running:
                 stop_watchdog()
-                st.rerun()
             st.info("📝 動画処理は「🎬 動画処理」タブから手動で実行できます。")
     
     # メインエリア
-    # フォルダ作成
-    created = create_folders()
-    if created:
-        st.info(f"📁 以下のフォルダを作成しました: {', '.join(created)}")
+    # フォルダ作成（セッションごとに初回のみ）
+    if not st.session_state.get('folders_created'):
+        created = create_folders()
+        st.session_state.folders_created = True
+        if created:
+            st.info(f"📁 以下のフォルダを作成しました: {', '.join(created)}")
     
     # 起動時のガイドライン表示
     if not st.session_state.api_key_set and not os.environ.get('GEMINI_API_KEY'):
@@ -490,9 +987,11 @@ def main():
         if not st.session_state.api_key_set and not os.environ.get('GEMINI_API_KEY'):
             st.warning("⚠️ まず、サイドバーでGemini API Keyを設定してください")
         else:
-            character_manager = CharacterManager(BASE_DIR)
+            from prompt_generator import PromptGenerator
+            
+            character_manager = get_character_manager()
             prompt_generator = PromptGenerator()
-            prompt_history = PromptHistory(BASE_DIR)
+            prompt_history = get_prompt_history()
             
             st.header("🎨 プロンプト生成アシスタント（対話形式）")
             st.caption("対話に従って選択肢を選んでいくだけで、プロンプトが自動的に完成します。")
@@ -587,6 +1086,9 @@ def main():
                                 
                                 st.success("✅ プロンプトが生成されました")
                                 
+                                # ウィジェットのキーはプロンプト内容から生成（再実行でも同じキーを維持）
+                                key_hash = hashlib.blake2b(final_prompt.encode("utf-8"), digest_size=8).hexdigest()
+                                
                                 # nanobanana pro形式の場合はPositive/Negativeを分けて表示
                                 positive_part = ""
                                 negative_part = ""
@@ -606,14 +1108,14 @@ def main():
                                         "Positive Prompt（コピー用）",
                                         value=positive_part,
                                         height=100,
-                                        key=f"prompt_positive_{datetime.now().timestamp()}"
+                                        key=f"prompt_positive_{key_hash}"
                                     )
                                     
                                     st.text_area(
                                         "Negative Prompt（コピー用）",
                                         value=negative_part,
                                         height=100,
-                                        key=f"prompt_negative_{datetime.now().timestamp()}"
+                                        key=f"prompt_negative_{key_hash}"
                                     )
                                 else:
                                     st.code(final_prompt, language="text")
@@ -623,17 +1125,7 @@ def main():
                                         "生成されたプロンプト（コピー用）",
                                         value=final_prompt,
                                         height=150,
-                                        key=f"prompt_result_{datetime.now().timestamp()}"
-                                    )
-                                
-                                # プロンプト履歴に保存
-                                dialog_data = dialog.get_data() if dialog else {}
-                                prompt_history.add_prompt(
-                                    prompt_type=prompt_type,
-                                    positive_prompt=positive_part if positive_part else final_prompt,
-                                    negative_prompt=negative_part,
-                                    dialog_data=dialog_data,
-                                    final_prompt=final_prompt
+                                        key=f"prompt_result_{key_hash}"
                                     )
                                 
                                 # プロンプト履歴に保存
@@ -672,8 +1164,10 @@ def main():
         if not st.session_state.api_key_set:
             st.warning("⚠️ まず、サイドバーでGemini API Keyを設定してください")
         else:
-            prompt_history = PromptHistory(BASE_DIR)
-            history = prompt_history.load_history()
+            prompt_history = get_prompt_history()
+            history = _load_history_cached(_file_mtime_ns(prompt_history.history_file))
+            favorites = _load_favorites_cached(_file_mtime_ns(prompt_history.favorites_file))
+            favorite_ids = {f.get('id') for f in favorites}
             
             if history:
                 st.info(f"📋 {len(history)}件のプロンプト履歴があります")
@@ -708,8 +1202,7 @@ def main():
                                 st.success("プロンプトをコピーしました")
                         
                         with col2:
-                            favorites = prompt_history.load_favorites()
-                            is_favorite = any(f.get('id') == prompt_data.get('id') for f in favorites)
+                            is_favorite = prompt_data.get('id') in favorite_ids
                             if is_favorite:
                                 if st.button(f"⭐ お気に入りから削除", key=f"unfav_{i}"):
                                     prompt_history.remove_favorite(prompt_data.get('id'))
@@ -723,7 +1216,6 @@ def main():
             
             st.divider()
             st.subheader("⭐ お気に入りプロンプト")
-            favorites = prompt_history.load_favorites()
             if favorites:
                 for fav in favorites:
                     with st.expander(f"⭐ {fav.get('prompt_type', '不明')} - {fav.get('timestamp', '')}"):
@@ -742,7 +1234,7 @@ def main():
         if not st.session_state.api_key_set:
             st.warning("⚠️ まず、サイドバーでGemini API Keyを設定してください")
         else:
-            media_processor = MediaProcessor(BASE_DIR, add_log)
+            media_processor = get_media_processor()
             
             # 処理タイプの選択
             process_type = st.radio(
@@ -773,12 +1265,12 @@ def main():
             
             # フォルダ内の動画ファイルを取得（再帰的にサブフォルダも検索、使用済み素材フォルダも含む）
             if source_folder.exists():
-                video_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v'}
-                video_files = [
-                    f for f in source_folder.rglob("*")
-                    if f.is_file() 
-                    and f.suffix.lower() in video_extensions
-                ]
+                # 動画ファイル→(サイズ, 更新時刻ns)（一覧取得時の値を表示にも使い回す）
+                file_stats = {
+                    Path(path): (size, mtime_ns)
+                    for path, size, mtime_ns in _list_videos(str(source_folder))
+                }
+                video_files = list(file_stats)
                 
                 if video_files:
                     st.info(f"📂 {source_folder.name} フォルダに {len(video_files)} 個の動画ファイルがあります")
@@ -786,6 +1278,9 @@ def main():
                     # サムネイル付きでファイル一覧を表示
                     st.subheader("📹 動画ファイル一覧（サムネイル付き）")
                     
+                    # キャッシュのないサムネイルを先にまとめて並列生成
+                    _prefetch_thumbnails(media_processor, video_files, file_stats)
+                    
                     # グリッド表示（3列）
                     cols_per_row = 3
                     for row_start in range(0, len(video_files), cols_per_row):
@@ -794,12 +1289,12 @@ def main():
                         
                         for idx, video_file in enumerate(row_files):
                             with cols[idx]:
-                                # サムネイルを生成（同期的に実行）
+                                # サムネイルを取得（キャッシュがない場合のみ生成）
                                 thumbnail_path = None
                                 
-                                # サムネイル生成を試行
+                                # サムネイル取得を試行
                                 try:
-                                    thumbnail_path = media_processor.generate_thumbnail(video_file)
+                                    thumbnail_path = _cached_thumbnail(media_processor, video_file, file_stats[video_file])
                                 except Exception as e:
                                     # エラーは無視して続行
                                     pass
@@ -809,10 +1304,8 @@ def main():
                                     try:
                                         file_size = thumbnail_path.stat().st_size
                                         if file_size > 0:
-                                            # 画像をバイトデータとして読み込んで表示
-                                            with open(thumbnail_path, "rb") as f:
-                                                img_bytes = f.read()
-                                                st.image(img_bytes, caption=video_file.name, use_container_width=True)
+                                            # パスを直接渡して表示（毎回バイトデータとして読み込まない）
+                                            st.image(str(thumbnail_path), caption=video_file.name, use_container_width=True)
                                         else:
                                             # 空のファイル
                                             st.info(f"📹 {video_file.name}")
@@ -824,7 +1317,7 @@ def main():
                                     st.info(f"📹 {video_file.name}")
                                 
                                 # ファイル情報
-                                file_size = video_file.stat().st_size / (1024 * 1024)  # MB
+                                file_size = file_stats[video_file][0] / (1024 * 1024)  # MB
                                 st.caption(f"{file_size:.1f} MB")
                                 
                                 # 選択ボタン
@@ -834,23 +1327,28 @@ def main():
                     
                     st.divider()
                     
+                    # ファイル名の一覧と位置の対応を一度だけ作成（同名ファイルは先頭の位置を使用）
+                    file_names = [f.name for f in video_files]
+                    name_to_idx = {}
+                    for i, name in enumerate(file_names):
+                        name_to_idx.setdefault(name, i)
+                    
                     # 選択されたファイルを表示
                     selected_file = st.session_state.get("selected_video_file", None)
                     if selected_file:
                         # 選択されたファイルが存在するか確認
-                        if not any(f.name == selected_file for f in video_files):
+                        if selected_file not in name_to_idx:
                             selected_file = None
                             st.session_state.selected_video_file = None
                     
                     # ファイル選択（ドロップダウンも残す）
-                    file_names = [f.name for f in video_files]
                     if not selected_file and file_names:
                         selected_file = file_names[0]
                     
                     selected_file = st.selectbox(
                         "処理する動画ファイルを選択してください（または上記のサムネイルから選択）",
                         file_names,
-                        index=file_names.index(selected_file) if selected_file and selected_file in file_names else 0,
+                        index=name_to_idx.get(selected_file, 0),
                         key="selected_video_file_dropdown"
                     )
                     
@@ -860,18 +1358,21 @@ def main():
                     
                     if selected_file:
                         selected_path = source_folder / selected_file
+                        selected_stat = file_stats.get(selected_path)
+                        if selected_stat is None:
+                            stat = selected_path.stat()
+                            selected_stat = (stat.st_size, stat.st_mtime_ns)
                         
                         # ファイル情報の表示
                         col1, col2 = st.columns(2)
                         with col1:
                             st.metric("ファイル名", selected_file)
-                            file_size = selected_path.stat().st_size / (1024 * 1024)  # MB
+                            file_size = selected_stat[0] / (1024 * 1024)  # MB
                             st.metric("ファイルサイズ", f"{file_size:.2f} MB")
                         
                         with col2:
                             try:
-                                import ffmpeg
-                                probe = ffmpeg.probe(str(selected_path))
+                                probe = _probe_file(selected_path, selected_stat)
                                 video_stream = next((s for s in probe['streams'] if s.get('codec_type') == 'video'), None)
                                 if video_stream:
                                     width = video_stream.get('width', 0)
@@ -892,12 +1393,14 @@ def main():
                                     try:
                                         process_func(selected_path)
                                         st.success(f"✅ {process_name}処理が完了しました")
+                                        _list_videos.clear()
                                         st.rerun()
                                     except Exception as e:
                                         st.error(f"❌ 処理中にエラーが発生しました: {str(e)}")
                         
                         with col2:
                             if st.button("🔄 ファイル一覧を更新", key="refresh_button"):
+                                _list_videos.clear()
                                 st.rerun()
                         
                         # 複数ファイルの一括処理
@@ -920,18 +1423,40 @@ def main():
                                 success_count = 0
                                 error_count = 0
                                 
-                                for idx, file_name in enumerate(selected_files):
-                                    file_path = source_folder / file_name
-                                    status_text.text(f"処理中: {file_name} ({idx+1}/{len(selected_files)})")
-                                    
-                                    try:
-                                        process_func(file_path)
-                                        success_count += 1
-                                    except Exception as e:
-                                        error_count += 1
-                                        add_log(f"一括処理エラー ({file_name}): {str(e)}", "ERROR")
-                                    
-                                    progress_bar.progress((idx + 1) / len(selected_files))
+                                # 外部プロセス（ffmpeg等）主体の処理のためスレッドで並列実行
+                                # （GPUを使う高品質化・リップシンクは同時実行数を2に制限）
+                                if process_name in ("高品質化", "リップシンク"):
+                                    max_workers = 2
+                                else:
+                                    max_workers = min(4, os.cpu_count() or 1)
+                                
+                                # ワーカースレッドからもadd_log（セッション状態）を使えるようにする
+                                script_ctx = get_script_run_ctx()
+                                
+                                def _attach_script_ctx():
+                                    add_script_run_ctx(threading.current_thread(), script_ctx)
+                                
+                                status_text.text(f"処理中: 0/{len(selected_files)}")
+                                with ThreadPoolExecutor(
+                                    max_workers=max_workers,
+                                    thread_name_prefix="mvai-batch",
+                                    initializer=_attach_script_ctx
+                                ) as executor:
+                                    futures = {
+                                        executor.submit(process_func, source_folder / file_name): file_name
+                                        for file_name in selected_files
+                                    }
+                                    for done, future in enumerate(as_completed(futures), 1):
+                                        file_name = futures[future]
+                                        try:
+                                            future.result()
+                                            success_count += 1
+                                        except Exception as e:
+                                            error_count += 1
+                                            add_log(f"一括処理エラー ({file_name}): {str(e)}", "ERROR")
+                                        
+                                        status_text.text(f"完了: {file_name} ({done}/{len(selected_files)})")
+                                        progress_bar.progress(done / len(selected_files))
                                 
                                 status_text.empty()
                                 progress_bar.empty()
@@ -941,10 +1466,14 @@ def main():
                                 else:
                                     st.warning(f"⚠️ 処理完了: 成功 {success_count}個、エラー {error_count}個")
                                 
+                                _list_videos.clear()
                                 st.rerun()
                 else:
                     st.warning(f"⚠️ {source_folder.name} フォルダに動画ファイルがありません")
                     st.info(f"💡 動画ファイルを {source_folder.name} フォルダに配置してください")
+                    if st.button("🔄 ファイル一覧を更新", key="refresh_empty_button"):
+                        _list_videos.clear()
+                        st.rerun()
             else:
                 st.error(f"❌ {source_folder.name} フォルダが存在しません")
                 if st.button(f"📁 {source_folder.name} フォルダを作成", key="create_folder_button"):
@@ -959,22 +1488,18 @@ def main():
         # ログ表示
         if st.session_state.processing_logs:
             # 最新のログを上から表示
-            logs_df = pd.DataFrame(reversed(st.session_state.processing_logs))
-            
-            for _, log in logs_df.iterrows():
-                log_type = log['type']
-                if log_type == "SUCCESS":
-                    st.success(f"[{log['timestamp']}] {log['message']}")
-                elif log_type == "ERROR":
-                    st.error(f"[{log['timestamp']}] {log['message']}")
-                else:
-                    st.info(f"[{log['timestamp']}] {log['message']}")
+            # 1行ごとにコンポーネントを作らず、1つのMarkdownとしてまとめて表示
+            lines = [
+                f"{_LOG_ICONS.get(log['type'], 'ℹ️')} `[{_fmt_ts(log['timestamp_ns'])}]` {_escape_markdown(log['message'])}"
+                for log in reversed(st.session_state.processing_logs)
+            ]
+            st.markdown("  \n".join(lines))
         else:
             st.info("まだログがありません")
         
         # クリアボタン
         if st.button("ログをクリア"):
-            st.session_state.processing_logs = []
+            st.session_state.processing_logs.clear()
             st.rerun()
     
     # タブ6: フォルダ構成
@@ -993,8 +1518,7 @@ def main():
                 st.write(f"`{folder_path}`")
                 if exists:
                     # 再帰的にファイル数をカウント（サブフォルダも含む）
-                    file_count = sum(1 for _ in folder_path.rglob("*") if _.is_file())
-                    dir_count = sum(1 for _ in folder_path.rglob("*") if _.is_dir())
+                    file_count, dir_count = _count_entries(str(folder_path))
                     st.caption(f"{file_count} 個のファイル, {dir_count} 個のフォルダ")
     
     # タブ4: MV自動生成
@@ -1004,7 +1528,7 @@ def main():
         if not st.session_state.api_key_set:
             st.warning("⚠️ まず、サイドバーでGemini API Keyを設定してください")
         else:
-            media_processor = MediaProcessor(BASE_DIR, add_log)
+            media_processor = get_media_processor()
             
             st.markdown("""
             ### MV自動生成機能
@@ -1058,10 +1582,7 @@ def main():
                     clip_folder = BASE_DIR / "99_MV_編集素材"
             
             # 動画ファイルを取得（再帰的にサブフォルダも検索、使用済み素材フォルダも含む）
-            video_files = sorted([
-                f for f in clip_folder.rglob("*.mp4")
-                if f.is_file()
-            ])
+            video_files = [Path(path) for path, _, _ in _list_videos(str(clip_folder), ('.mp4',))]
             
             if not video_files:
                 st.warning(f"⚠️ {clip_folder.name}フォルダに動画ファイルが見つかりません")
@@ -1084,8 +1605,7 @@ def main():
                     st.subheader("🎵 音声ファイルの選択")
                     
                     # 音声ファイルを取得（再帰的にサブフォルダも検索）
-                    audio_files = sorted([f for f in (BASE_DIR / "99_MV_編集素材").rglob("*.mp3") if f.is_file()])
-                    audio_files.extend(sorted([f for f in (BASE_DIR / "99_MV_編集素材").rglob("*.wav") if f.is_file()]))
+                    audio_files = [Path(path) for path, _, _ in _list_audio(str(BASE_DIR / "99_MV_編集素材"))]
                     
                     if not audio_files:
                         st.warning("⚠️ 99_MV_編集素材フォルダに音声ファイルが見つかりません")
@@ -1132,52 +1652,35 @@ def main():
                                     if not output_filename:
                                         st.error("❌ 出力ファイル名を入力してください")
                                     else:
-                                        # MVは98_MV_完成品フォルダに保存
-                                        output_path = BASE_DIR / "98_MV_完成品" / f"{output_filename}.mp4"
-                                        
-                                        # 同名ファイルが存在する場合は番号を付ける
-                                        counter = 1
-                                        while output_path.exists():
-                                            output_path = BASE_DIR / "98_MV_完成品" / f"{output_filename}({counter}).mp4"
-                                            counter += 1
+                                        # MVは98_MV_完成品フォルダに保存（同名ファイルが存在する場合は接尾辞を付ける）
+                                        output_path = _reserve_output_path(BASE_DIR / "98_MV_完成品", output_filename, ".mp4")
                                         
                                         with st.spinner("MVを生成中... しばらくお待ちください"):
                                             try:
-                                                success = media_processor.create_mv_from_clips(
+                                                mv_info = media_processor.create_mv_from_clips(
                                                     selected_clip_paths,
                                                     audio_path,
                                                     output_path,
                                                     sync_to_beat=sync_to_beat
                                                 )
                                                 
-                                                if success:
+                                                if mv_info:
                                                     st.success(f"✅ MV生成が完了しました！")
                                                     st.info(f"📁 保存先: {output_path}")
                                                     st.info(f"💡 MVは「98_MV_完成品」フォルダに保存されました")
                                                     
-                                                    # ファイル情報を表示
-                                                    if output_path.exists():
-                                                        file_size = output_path.stat().st_size / (1024*1024)
-                                                        st.metric("ファイルサイズ", f"{file_size:.2f} MB")
-                                                        
-                                                        # 動画情報を取得
-                                                        try:
-                                                            import ffmpeg
-                                                            probe = ffmpeg.probe(str(output_path))
-                                                            video_stream = next((s for s in probe['streams'] if s.get('codec_type') == 'video'), None)
-                                                            if video_stream:
-                                                                width = video_stream.get('width', 0)
-                                                                height = video_stream.get('height', 0)
-                                                                duration = float(probe['format'].get('duration', 0))
-                                                                st.metric("解像度", f"{width}x{height}")
-                                                                st.metric("長さ", f"{duration:.1f}秒")
-                                                        except:
-                                                            pass
+                                                    # ファイル情報を表示（生成時に取得済みの情報を使用し、再度probeしない）
+                                                    st.metric("ファイルサイズ", f"{mv_info['size_bytes'] / (1024*1024):.2f} MB")
+                                                    if mv_info['width'] and mv_info['height']:
+                                                        st.metric("解像度", f"{mv_info['width']}x{mv_info['height']}")
+                                                    st.metric("長さ", f"{mv_info['duration']:.1f}秒")
                                                     
                                                     st.rerun()
                                                 else:
+                                                    _discard_reserved_path(output_path)
                                                     st.error("❌ MV生成に失敗しました。ログを確認してください。")
                                             except Exception as e:
+                                                _discard_reserved_path(output_path)
                                                 st.error(f"❌ MV生成中にエラーが発生しました: {str(e)}")
                                         
                             with col2:
@@ -1199,7 +1702,7 @@ def main():
                                 st.write(selected_audio)
                                 
                                 # ビートデータの確認
-                                beat_data = media_processor.load_beat_data(audio_path)
+                                beat_data = _load_beat_data(media_processor, audio_path)
                                 if beat_data:
                                     st.write(f"**BPM:** {beat_data['bpm']:.2f}")
                                     st.write(f"**ビート数:** {beat_data['total_beats']}")
@@ -1,11 +1,42 @@
 """
 キャラクター画像管理モジュール
+
+shutilは画像の保存・削除時にのみ必要なため、使用するメソッド内で遅延インポートする
 """
 
+import copy
+import errno
+import functools
+import os
+import threading
+import time
+import uuid
 from pathlib import Path
-import shutil
-import json
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from operator import itemgetter
+from types import MappingProxyType
+from typing import List, Dict, Mapping, Optional, Tuple
+
+from json_utils import dump_json, load_json
+
+
+# キャラクター画像として扱う拡張子（ドットなし、rpartition('.')の結果と比較する）
+IMAGE_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'})
+
+# アップロード画像を書き込む際のバッファサイズ
+COPY_BUFFER_SIZE = 1 << 20
+
+_get_name = itemgetter("name")
+
+
+def _synchronized(method):
+    """インスタンスのロックを保持してメソッドを実行する（インスタンスは全セッション・スレッドで共有される）"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class CharacterManager:
@@ -14,30 +45,180 @@ class CharacterManager:
     def __init__(self, base_dir: Path):
         self.base_dir = base_dir
         self.characters_dir = base_dir / "00_キャラクター"
-        self.characters_dir.mkdir(parents=True, exist_ok=True)
+        # フォルダは書き込み時に初めて作成する（読み取りのみの場合は作成しない）
+        self._ensured = False
         self.metadata_file = self.characters_dir / ".characters.json"
+        # base_dirからの相対パスを文字列操作で求めるための接頭辞
+        self._base_prefix = os.path.join(os.fspath(base_dir), '')
+        
+        # 読み込んだキャラクター情報のキャッシュ（メタデータファイルの更新時刻で無効化）
+        self._cache: Optional[Dict[str, Dict]] = None
+        self._cache_mtime = -1
+        # キャッシュの読み取り専用ビュー（読み取りのみのメソッドはこちらを使う）
+        self._cache_view: Mapping[str, Dict] = MappingProxyType({})
+        # キャラクター名→フォルダ名の索引（キャッシュと同時に更新）
+        self._name_to_folder: Dict[str, str] = {}
+        # フォルダ名→(フォルダの更新時刻, 画像一覧)（フォルダ内のファイルが増減するまで再走査しない）
+        self._image_cache: Dict[str, Tuple[int, List[Path]]] = {}
+        # フォルダ名→登録済み画像パスの集合（"images"リストの重複確認用、キャッシュと同じ辞書に対してのみ有効）
+        self._image_sets: Dict[str, set] = {}
+        # このインスタンスで作成（確認）済みのキャラクターフォルダ名
+        self._known_dirs: set = set()
+        
+        # batch()中は保存を遅延し、終了時に1回だけ書き込む
+        self._batch_depth = 0
+        self._batch_dirty = False
+        
+        # キャッシュを変更・参照するメソッドとbatch()の排他制御
+        # （st.cache_resourceで全ブラウザセッションから共有されるため）
+        self._lock = threading.RLock()
     
-    def load_characters(self) -> Dict[str, Dict]:
-        """登録されているキャラクター一覧を読み込む"""
-        if self.metadata_file.exists():
+    def _ensure_dir(self):
+        """キャラクターフォルダを作成（インスタンスごとに1回のみ）"""
+        if not self._ensured:
+            self.characters_dir.mkdir(parents=True, exist_ok=True)
+            self._ensured = True
+    
+    @contextmanager
+    def batch(self):
+        """
+        ブロック内のキャラクター情報の保存をまとめて、終了時に1回だけ書き込む
+        
+        使用例:
+            with character_manager.batch():
+                for f in uploaded_files:
+                    character_manager.add_character(name, None, f)
+        
+        Raises:
+            OSError: 終了時の書き込みに失敗した場合（ブロック内の変更は保存されていない）
+        """
+        with self._lock:
+            self._batch_depth += 1
+            saved = True
             try:
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception:
-                return {}
-        return {}
-    
-    def save_characters(self, characters: Dict[str, Dict]):
-        """キャラクター情報を保存"""
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._batch_dirty:
+                    self._batch_dirty = False
+                    saved = self._write_characters(self._cache or {})
+        if not saved:
+            raise OSError("キャラクター情報の保存に失敗しました")
+    
+    def _set_cache(self, characters: Optional[Dict[str, Dict]], mtime: int = -1):
+        """キャッシュとキャラクター名の索引を更新（Noneで破棄）"""
+        if characters is not self._cache:
+            self._image_sets = {}
+        self._cache = characters
+        self._cache_mtime = mtime
+        self._cache_view = MappingProxyType(characters if characters is not None else {})
+        self._name_to_folder = {}
+        for folder_name, char_info in (characters or {}).items():
+            # 同名のキャラクターが複数ある場合は先に登録されたものを使用
+            self._name_to_folder.setdefault(char_info.get("name"), folder_name)
+    
+    @_synchronized
+    def _find_folder(self, character_name: str) -> Optional[str]:
+        """キャラクター名からフォルダ名を取得（見つからない場合はNone）"""
+        self._load_characters()
+        return self._name_to_folder.get(character_name)
+    
+    def _relative_to_base(self, path: Path) -> str:
+        """base_dir配下のパスをbase_dirからの相対パス文字列に変換（pathlibのrelative_toを使わない）"""
+        path_str = os.fspath(path)
+        if path_str.startswith(self._base_prefix):
+            return path_str[len(self._base_prefix):]
+        return str(Path(path_str).relative_to(self.base_dir))
+    
+    @_synchronized
+    def load_characters(self) -> Dict[str, Dict]:
+        """
+        登録されているキャラクター一覧を読み込む
+        
+        キャッシュのコピーを返すため、変更してもsave_characters()で保存するまで反映されません。
+        """
+        return copy.deepcopy(self._load_characters())
+    
+    @_synchronized
+    def _load_characters(self) -> Dict[str, Dict]:
+        """
+        キャッシュしているキャラクター一覧をそのまま取得（変更は書き込み処理のみで行う）
+        
+        メタデータファイルの更新時刻が前回の読み込み時から変わっていなければ、
+        ファイルを読み直さずにキャッシュを返します。
+        """
+        # batch()中はまだ書き込んでいない変更を含むキャッシュを返す
+        if self._batch_depth and self._cache is not None:
+            return self._cache
+        
+        try:
+            mtime = self.metadata_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._set_cache(None)
+            return {}
+        
+        if self._cache is not None and mtime == self._cache_mtime:
+            return self._cache
+        
         try:
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(characters, f, ensure_ascii=False, indent=2)
+            characters = load_json(self.metadata_file)
+        except Exception:
+            self._set_cache(None)
+            return {}
+        
+        self._set_cache(characters, mtime)
+        for folder_name, char_info in characters.items():
+            # "images"のない古い形式のエントリを補完し、重複確認用の集合を作成
+            images = char_info.setdefault("images", [])
+            self._image_sets[folder_name] = set(images)
+        return characters
+    
+    @_synchronized
+    def get_characters_view(self) -> Mapping[str, Dict]:
+        """
+        登録されているキャラクター一覧を読み取り専用ビューとして取得
+        
+        キャッシュをコピーせずにそのまま参照するため、変更する場合はload_characters()のコピーを使用してください。
+        """
+        self._load_characters()
+        return self._cache_view
+    
+    @_synchronized
+    def save_characters(self, characters: Dict[str, Dict], durable: bool = False):
+        """
+        キャラクター情報を保存（batch()中はキャッシュのみ更新し、書き込みはbatch()の終了時に行う）
+        
+        Args:
+            characters: 保存するキャラクター情報
+            durable: 書き込み後にfsyncするかどうか
+        """
+        if characters is not self._cache:
+            # 呼び出し元が保存後に変更してもキャッシュに影響しないようにコピーしてキャッシュする
+            characters = copy.deepcopy(characters)
+        if self._batch_depth:
+            self._set_cache(characters, self._cache_mtime)
+            self._batch_dirty = True
+            return True
+        return self._write_characters(characters, durable=durable)
+    
+    @_synchronized
+    def _write_characters(self, characters: Dict[str, Dict], durable: bool = False) -> bool:
+        """キャラクター情報をメタデータファイルに書き込む（一時ファイルに書き込んでから置き換える）"""
+        try:
+            self._ensure_dir()
+            dump_json(characters, self.metadata_file, durable=durable)
+            # 保存した内容をキャッシュし、次回の読み込みでファイルを読み直さない
+            self._set_cache(characters, self.metadata_file.stat().st_mtime_ns)
             return True
         except Exception as e:
+            # キャッシュが保存に失敗した変更を含んでいる可能性があるため破棄
+            self._set_cache(None)
             print(f"キャラクター情報の保存に失敗: {str(e)}")
             return False
     
-    def add_character(self, name: str, image_path: Path, uploaded_file=None) -> Optional[Path]:
+    @_synchronized
+    def add_character(self, name: str, image_path: Path, uploaded_file=None,
+                      preserve_numbering: bool = False) -> Optional[Path]:
         """
         新しいキャラクター画像を追加（同名の場合は同じフォルダに保存）
         
@@ -45,6 +226,8 @@ class CharacterManager:
             name: キャラクター名
             image_path: 画像ファイルのパス（一時ファイルの場合）
             uploaded_file: StreamlitのUploadedFileオブジェクト（優先）
+            preserve_numbering: 同名ファイルがある場合に、ランダムな接尾辞ではなく
+                (1), (2)...の番号を付けるかどうか（空き番号を探すため既存ファイル数に比例して遅くなる）
         
         Returns:
             保存された画像のパス、またはNone
@@ -56,11 +239,14 @@ class CharacterManager:
         folder_name = name.strip()
         
         # 既存のキャラクター情報を読み込む
-        characters = self.load_characters()
+        characters = self._load_characters()
         
-        # キャラクター専用フォルダを作成（既存の場合はそのまま使用）
+        # キャラクター専用フォルダを作成（既存の場合はそのまま使用、作成確認はキャラクターごとに1回のみ）
+        self._ensure_dir()
         char_dir = self.characters_dir / folder_name
-        char_dir.mkdir(parents=True, exist_ok=True)
+        if folder_name not in self._known_dirs:
+            char_dir.mkdir(parents=True, exist_ok=True)
+            self._known_dirs.add(folder_name)
         
         # 画像ファイル名を決定
         if uploaded_file:
@@ -70,22 +256,27 @@ class CharacterManager:
             original_filename = image_path.stem
             image_ext = image_path.suffix
         
-        # 同じファイル名が存在する場合は番号を付ける
+        # 同じファイル名が存在する場合は接尾辞を付ける
         dest_filename = f"{original_filename}{image_ext}"
         dest_image_path = char_dir / dest_filename
         counter = 1
         while dest_image_path.exists():
-            dest_filename = f"{original_filename}({counter}){image_ext}"
+            if preserve_numbering:
+                dest_filename = f"{original_filename}({counter}){image_ext}"
+                counter += 1
+            else:
+                # 番号を順に試さず、ランダムな接尾辞で1回で空き名を得る
+                dest_filename = f"{original_filename}_{uuid.uuid4().hex[:8]}{image_ext}"
             dest_image_path = char_dir / dest_filename
-            counter += 1
         
         try:
             # 画像を保存
-            if uploaded_file:
-                with open(dest_image_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-            else:
-                shutil.copy2(image_path, dest_image_path)
+            try:
+                self._save_image(dest_image_path, image_path, uploaded_file)
+            except FileNotFoundError:
+                # アプリの外でフォルダが削除された場合は作り直して1回だけ再試行
+                char_dir.mkdir(parents=True, exist_ok=True)
+                self._save_image(dest_image_path, image_path, uploaded_file)
             
             # メタデータを更新（既存のキャラクターの場合は画像リストを更新）
             if folder_name not in characters:
@@ -93,20 +284,25 @@ class CharacterManager:
                     "name": name,
                     "folder_name": folder_name,
                     "images": [],
-                    "created_at": str(Path(dest_image_path).stat().st_mtime),
+                    "created_at": str(time.time()),
                     "attributes": {}
                 }
             
-            # 画像パスをリストに追加
-            image_relative_path = str(dest_image_path.relative_to(self.base_dir))
-            if image_relative_path not in characters[folder_name].get("images", []):
-                if "images" not in characters[folder_name]:
-                    characters[folder_name]["images"] = []
-                characters[folder_name]["images"].append(image_relative_path)
+            # 画像パスをリストに追加（重複確認はリストの走査ではなく集合で行う）
+            image_relative_path = self._relative_to_base(dest_image_path)
+            char_info = characters[folder_name]
+            images = char_info["images"]
+            image_set = self._image_sets.get(folder_name)
+            if image_set is None:
+                # 新規キャラクター、またはメタデータファイルがまだない場合
+                image_set = self._image_sets[folder_name] = set(images)
+            if image_relative_path not in image_set:
+                images.append(image_relative_path)
+                image_set.add(image_relative_path)
             
             # 最初の画像をメイン画像として設定（まだ設定されていない場合）
-            if "image_path" not in characters[folder_name] or not characters[folder_name]["image_path"]:
-                characters[folder_name]["image_path"] = image_relative_path
+            if not char_info.get("image_path"):
+                char_info["image_path"] = image_relative_path
             
             self.save_characters(characters)
             return dest_image_path
@@ -114,24 +310,81 @@ class CharacterManager:
             print(f"キャラクター追加エラー: {str(e)}")
             return None
     
+    def _save_image(self, dest_image_path: Path, image_path: Path, uploaded_file=None):
+        """アップロードされた画像、または画像ファイルを保存先に書き込む"""
+        if uploaded_file:
+            # 1MiBずつ書き込み、大きな画像でもバッファ全体を一度に書き込まない
+            import shutil
+            uploaded_file.seek(0)
+            with open(dest_image_path, "wb") as f:
+                shutil.copyfileobj(uploaded_file, f, length=COPY_BUFFER_SIZE)
+        else:
+            self._link_or_copy(image_path, dest_image_path)
+    
+    @staticmethod
+    def _link_or_copy(src: Path, dest: Path):
+        """
+        同じファイルシステム上ならハードリンクを作成し（データをコピーしない）、
+        別ドライブやハードリンク非対応の場合はコピーする
+        """
+        try:
+            os.link(src, dest)
+        except OSError as e:
+            # 複製先が既にある場合以外は、ハードリンクに対応しないドライブ（FAT32/exFAT/ネットワーク
+            # ドライブなど。Windowsではエラー番号が不定）とみなしてコピーする
+            if e.errno == errno.EEXIST:
+                raise
+            import shutil
+            shutil.copy2(src, dest)
+    
+    def add_characters_bulk(self, name: str, uploaded_files) -> List[Path]:
+        """
+        複数のキャラクター画像をまとめて追加（メタデータの保存は1回のみ）
+        
+        Args:
+            name: キャラクター名
+            uploaded_files: StreamlitのUploadedFileオブジェクトのリスト
+        
+        Returns:
+            保存された画像のパスのリスト（失敗した画像は含まない。メタデータの保存に失敗した場合は空のリスト）
+        """
+        saved_paths = []
+        try:
+            with self.batch():
+                for uploaded_file in uploaded_files:
+                    dest_path = self.add_character(name, None, uploaded_file)
+                    if dest_path:
+                        saved_paths.append(dest_path)
+        except OSError:
+            # メタデータに登録されなかった画像を削除
+            for dest_path in saved_paths:
+                try:
+                    dest_path.unlink()
+                except OSError:
+                    pass
+            return []
+        return saved_paths
+    
+    @_synchronized
     def get_character_list(self) -> List[str]:
         """登録されているキャラクター名のリストを取得"""
-        characters = self.load_characters()
-        return [char_info["name"] for char_info in characters.values()]
+        return list(map(_get_name, self.get_characters_view().values()))
     
+    @_synchronized
     def get_character_folders(self) -> List[str]:
         """キャラクターのフォルダ名リストを取得"""
-        characters = self.load_characters()
-        return list(characters.keys())
+        return list(self.get_characters_view())
     
+    @_synchronized
     def delete_character(self, folder_name: str) -> bool:
         """キャラクターを削除"""
-        characters = self.load_characters()
+        characters = self._load_characters()
         
         if folder_name in characters:
             # フォルダを削除
             char_dir = self.characters_dir / folder_name
             if char_dir.exists():
+                import shutil
                 try:
                     shutil.rmtree(char_dir)
                 except Exception as e:
@@ -139,48 +392,87 @@ class CharacterManager:
             
             # メタデータから削除
             del characters[folder_name]
+            self._image_sets.pop(folder_name, None)
+            self._known_dirs.discard(folder_name)
             return self.save_characters(characters)
         
         return False
     
+    @_synchronized
     def get_character_attributes(self, character_name: str) -> Dict:
-        """キャラクターの属性を取得"""
-        characters = self.load_characters()
-        for folder_name, char_info in characters.items():
-            if char_info.get("name") == character_name:
-                return char_info.get("attributes", {})
-        return {}
+        """キャラクターの属性を取得（キャッシュのコピーを返す）"""
+        folder_name = self._find_folder(character_name)
+        if folder_name is None:
+            return {}
+        return copy.deepcopy(self._cache_view[folder_name].get("attributes", {}))
     
+    @_synchronized
     def save_character_attributes(self, character_name: str, attributes: Dict) -> bool:
         """キャラクターの属性を保存"""
-        characters = self.load_characters()
-        for folder_name, char_info in characters.items():
-            if char_info.get("name") == character_name:
-                char_info["attributes"] = attributes
-                return self.save_characters(characters)
-        return False
+        folder_name = self._find_folder(character_name)
+        if folder_name is None:
+            return False
+        characters = self._cache
+        # 変更がない場合は書き込まない
+        if characters[folder_name].get("attributes") == attributes:
+            return True
+        # 呼び出し元が保存後に変更してもキャッシュに影響しないようにコピーして保持する
+        characters[folder_name]["attributes"] = copy.deepcopy(attributes)
+        return self.save_characters(characters)
     
     def get_character_images(self, character_name: str) -> List[Path]:
         """キャラクターのフォルダ内の全画像を取得"""
-        characters = self.load_characters()
-        for folder_name, char_info in characters.items():
-            if char_info.get("name") == character_name:
-                char_dir = self.characters_dir / folder_name
-                if char_dir.exists():
-                    # 画像ファイルのみを取得
-                    image_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'}
-                    images = []
-                    for img_path in char_dir.iterdir():
-                        if img_path.is_file() and img_path.suffix.lower() in image_extensions:
-                            images.append(img_path)
-                    return sorted(images)
-        return []
+        folder_name = self._find_folder(character_name)
+        if folder_name is None:
+            return []
+        return self._folder_images(folder_name)
+    
+    def get_all_character_images(self) -> Dict[str, List[Path]]:
+        """
+        全キャラクターのフォルダ内の画像をまとめて取得
+        
+        フォルダごとの走査をスレッドで並列に行います（走査中はGILが解放されるため、I/O待ちが重なる）。
+        
+        Returns:
+            キャラクター名→画像パスのソート済みリストの辞書
+        """
+        self._load_characters()
+        folders = dict(self._name_to_folder)
+        if not folders:
+            return {}
+        
+        with ThreadPoolExecutor(max_workers=min(8, len(folders))) as executor:
+            results = executor.map(self._folder_images, folders.values())
+            return dict(zip(folders.keys(), results))
+    
+    def _folder_images(self, folder_name: str) -> List[Path]:
+        """キャラクターフォルダ内の画像一覧を取得（フォルダの更新時刻が変わるまでキャッシュ）"""
+        char_dir = self.characters_dir / folder_name
+        try:
+            dir_mtime = char_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._image_cache.pop(folder_name, None)
+            return []
+        
+        cached = self._image_cache.get(folder_name)
+        if cached is not None and cached[0] == dir_mtime:
+            return list(cached[1])
+        
+        # 画像ファイルのみを取得（DirEntryのキャッシュされた種別を使い、エントリごとにstatしない）
+        images = []
+        with os.scandir(char_dir) as entries:
+            for entry in entries:
+                _, dot, ext = entry.name.rpartition('.')
+                if dot and ext.lower() in IMAGE_EXTENSIONS and entry.is_file(follow_symlinks=False):
+                    images.append(Path(entry.path))
+        images.sort()
+        self._image_cache[folder_name] = (dir_mtime, images)
+        return list(images)
     
     def get_character_folder_path(self, character_name: str) -> Optional[Path]:
         """キャラクターのフォルダパスを取得"""
-        characters = self.load_characters()
-        for folder_name, char_info in characters.items():
-            if char_info.get("name") == character_name:
-                return self.characters_dir / folder_name
-        return None
+        folder_name = self._find_folder(character_name)
+        if folder_name is None:
+            return None
+        return self.characters_dir / folder_name
 
@@ -0,0 +1,83 @@
+"""
+JSONファイル入出力ユーティリティ
+orjsonがインストールされている場合はorjsonを使用し、ない場合は標準のjsonにフォールバック
+"""
+
+import os
+from pathlib import Path
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    # 標準のjsonはorjsonがない場合のみインポート
+    orjson = None
+    import json
+
+
+def loads_json(data: bytes) -> Any:
+    """
+    UTF-8のJSONバイト列をオブジェクトに変換
+
+    Args:
+        data: JSONバイト列
+
+    Returns:
+        変換したオブジェクト
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode('utf-8'))
+
+
+def load_json(path: Path) -> Any:
+    """
+    JSONファイルを読み込む
+
+    Args:
+        path: 読み込むファイルのパス
+
+    Returns:
+        読み込んだオブジェクト
+    """
+    return loads_json(Path(path).read_bytes())
+
+
+def dumps_json(obj: Any, indent: bool = True) -> bytes:
+    """
+    オブジェクトをUTF-8のJSONバイト列に変換
+
+    Args:
+        obj: 変換するオブジェクト
+        indent: 2スペースでインデントするかどうか
+
+    Returns:
+        JSONバイト列
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
+
+
+def dump_json(obj: Any, path: Path, indent: bool = True, durable: bool = False):
+    """
+    オブジェクトをJSONファイルに保存
+
+    一時ファイルに書き込んでから置き換えるため、書き込み途中で中断しても
+    既存のファイルが壊れることはありません。
+
+    Args:
+        obj: 保存するオブジェクト
+        path: 保存先のパス
+        indent: 2スペースでインデントするかどうか
+        durable: 置き換える前にfsyncしてディスクへの書き込みを保証するかどうか
+            （電源断にも備える場合のみ。頻繁に保存するファイルでは不要）
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(dumps_json(obj, indent=indent))
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -1,28 +1,170 @@
 """
 メディア処理パイプライン
 librosa、ffmpeg-pythonを使用した音声・動画処理
+
+起動時間短縮のため、重いモジュール（librosa）は使用するメソッド内で遅延インポートする
 """
 
+import collections
+import errno
+import itertools
 import os
-import librosa
 import numpy as np
-import pandas as pd
 from pathlib import Path
 import subprocess
+import sys
 import ffmpeg
 from datetime import datetime
+from hashlib import blake2b
 import shutil
-from PIL import Image
 import tempfile
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import Optional, List
+from xml.sax.saxutils import escape
+
+try:
+    import av
+except ImportError:
+    # PyAVがない場合はffprobeで動画クリップの情報を取得する
+    av = None
+
+
+# 最終素材のXMLメタデータのテンプレート（{video}・{audio}は該当するストリームがある場合のみ埋め込む）
+_XML_TEMPLATE = """<?xml version='1.0' encoding='utf-8'?>
+<MVAsset version="1.0">
+  <Info>
+    <FileName>{file_name}</FileName>
+    <OriginalFileName>{original_file_name}</OriginalFileName>
+    <ProcessedDate>{processed_date}</ProcessedDate>
+  </Info>
+{video}{audio}  <ProcessingHistory>
+    <QualityEnhancement>Applied</QualityEnhancement>
+    <Lipsync>Applied</Lipsync>
+    <Finalized>{finalized}</Finalized>
+  </ProcessingHistory>
+</MVAsset>"""
+
+_XML_VIDEO_TEMPLATE = """  <Video>
+    <Codec>{codec}</Codec>
+    <Width>{width}</Width>
+    <Height>{height}</Height>
+    <FrameRate>{frame_rate}</FrameRate>
+    <Duration>{duration}</Duration>
+    <Bitrate>{bitrate}</Bitrate>
+  </Video>
+"""
+
+_XML_AUDIO_TEMPLATE = """  <Audio>
+    <Codec>{codec}</Codec>
+    <SampleRate>{sample_rate}</SampleRate>
+    <Channels>{channels}</Channels>
+    <Bitrate>{bitrate}</Bitrate>
+  </Audio>
+"""
+
+# Numbaでコンパイルした、フレームごとのRMSを計算する関数（初回使用時にコンパイル）
+_frame_rms_kernel = None
+
+
+def _frame_rms(y: np.ndarray, frame_length: int, hop_length: int) -> np.ndarray:
+    """
+    フレームごとのRMS（二乗平均平方根）を計算
+    
+    numbaはlibrosaの依存ライブラリのため、librosaと同様に初回使用時にインポート・コンパイルする。
+    
+    Args:
+        y: モノラルのfloat32波形（C連続）
+        frame_length: フレーム長（サンプル数）
+        hop_length: フレームの間隔（サンプル数）
+    
+    Returns:
+        フレームごとのRMS（波形がフレーム長より短い場合は全体を1フレームとする）
+    """
+    global _frame_rms_kernel
+    if _frame_rms_kernel is None:
+        from numba import njit
+        
+        @njit(fastmath=True)
+        def kernel(y, frame, hop):
+            if len(y) < frame:
+                frame = len(y)
+            n = 1 + (len(y) - frame) // hop
+            out = np.empty(n, dtype=np.float32)
+            for i in range(n):
+                s = 0.0
+                base = i * hop
+                for j in range(frame):
+                    v = y[base + j]
+                    s += v * v
+                out[i] = (s / frame) ** 0.5
+            return out
+        
+        _frame_rms_kernel = kernel
+    return _frame_rms_kernel(y, frame_length, hop_length)
 
 
 class MediaProcessor:
     """メディアファイル処理クラス"""
     
+    # サムネイルの出力幅（px、グリッドの表示幅に合わせる）とJPEG品質（-q:v、2〜31で小さいほど高品質）
+    THUMBNAIL_WIDTH = 320
+    THUMBNAIL_QUALITY = 5
+    
+    # ビート検出時のサンプリングレート（Hz、これより高い音声はダウンサンプリングする）
+    BEAT_SAMPLE_RATE = 22050
+    # ビート検出のホップ長（サンプル数、librosaの既定値）
+    BEAT_HOP_LENGTH = 512
+    # 無音判定のフレーム長（サンプル数）と、これ未満の最大RMS（dBFS）を無音とみなすしきい値
+    BEAT_FRAME_LENGTH = 2048
+    SILENCE_THRESHOLD_DB = -40.0
+    
+    # 高品質化で優先して使用するハードウェアエンコーダー（NVIDIA NVENC、Intel Quick Sync）
+    HW_ENCODERS = ('h264_nvenc', 'h264_qsv')
+    # GPU・ドライバーがなくハードウェアエンコーダーを使用できないことを示すffmpegのエラー出力
+    # （この場合は以降のエンコードでハードウェアエンコーダーを使用しない）
+    HW_ENCODER_UNAVAILABLE_ERRORS = (
+        'No NVENC capable devices',
+        'Cannot load',
+    )
+    # ハードウェアエンコーダーを初期化できなかったことを示すffmpegのエラー出力
+    # （同時セッション数の上限などの一時的な原因もあるため、連続して失敗した場合のみ使用しない）
+    HW_ENCODER_INIT_ERRORS = (
+        'Error while opening encoder',
+        'OpenEncodeSessionEx failed',
+        'Error initializing an internal MFX session',
+    )
+    # 初期化の失敗が何回連続したらハードウェアエンコーダーを使用しないか
+    HW_ENCODER_MAX_INIT_FAILURES = 3
+    
+    # ffmpeg.probeの結果をキャッシュする最大件数（古いものから破棄）
+    PROBE_CACHE_SIZE = 256
+    
+    # フォルダ作成済みのbase_dir（インスタンスを作り直しても再作成しない）
+    _dirs_ready = set()
+    
+    # 処理段階（フォルダ名）ごとの同時実行数を制限するセマフォ（同時に実行される全バッチで共有）
+    _stage_slots = {}
+    _stage_slots_lock = threading.Lock()
+    
+    # 実行中の高品質化エンコード数（エンコードごとのスレッド数をCPUコア数から配分する）
+    _active_encodes = 0
+    _encode_lock = threading.Lock()
+    
     def __init__(self, base_dir: Path, log_callback=None):
         self.base_dir = base_dir
         self.log_callback = log_callback if log_callback else lambda msg, typ="INFO": None
+        # 使用できるハードウェアエンコーダー（None: 未確認、'': なし）
+        self._hw_encoder = None
+        # ハードウェアエンコーダーの初期化に連続して失敗した回数
+        self._hw_init_failures = 0
+        # フレームレート補間の方式（fast: ブレンド補間、best: minterpolateによるモーション補間）
+        self.hq_interpolation = os.environ.get('MVAI_INTERP', 'fast')
+        # ffmpeg.probeの結果のキャッシュ（(パス, 更新時刻, サイズ)をキーにしたLRU）
+        self._probe_cache = collections.OrderedDict()
+        self._probe_lock = threading.Lock()
         
         # フォルダパスの定義
         self.input_audio_dir = base_dir / "01_曲_Input"
@@ -35,21 +177,98 @@ class MediaProcessor:
         self.mv_output_dir = base_dir / "98_MV_完成品"
         self.logs_dir = base_dir / "99_Logs"
         
-        # ログフォルダの作成
-        self.logs_dir.mkdir(parents=True, exist_ok=True)
-        self.still_images_dir.mkdir(parents=True, exist_ok=True)
-        self.hq_video_dir.mkdir(parents=True, exist_ok=True)
-        self.lipsync_video_dir.mkdir(parents=True, exist_ok=True)
-        self.final_assets_dir.mkdir(parents=True, exist_ok=True)
-        self.mv_output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 使用済み素材フォルダの作成
-        (self.ai_video_dir / "使用済み素材").mkdir(parents=True, exist_ok=True)
-        (self.hq_video_dir / "使用済み素材").mkdir(parents=True, exist_ok=True)
-        (self.lipsync_video_dir / "使用済み素材").mkdir(parents=True, exist_ok=True)
-        
-        # 99_MV_編集素材のサブフォルダ作成（音声ファイル用）
-        (self.final_assets_dir / "音声ファイル").mkdir(parents=True, exist_ok=True)
+        self._ensure_dirs()
+    
+    def _ensure_dirs(self):
+        """
+        出力・使用済み素材フォルダを作成（同じbase_dirではプロセス内で1回のみ）
+        """
+        key = str(self.base_dir)
+        if key in MediaProcessor._dirs_ready:
+            return
+        
+        for path in (
+            # ログ・出力フォルダ
+            self.logs_dir,
+            self.still_images_dir,
+            self.hq_video_dir,
+            self.lipsync_video_dir,
+            self.final_assets_dir,
+            self.mv_output_dir,
+            # 無音のため解析をスキップした音声の移動先
+            self.input_audio_dir / "無音スキップ",
+            # 使用済み素材フォルダ
+            self.ai_video_dir / "使用済み素材",
+            self.hq_video_dir / "使用済み素材",
+            self.lipsync_video_dir / "使用済み素材",
+            # 99_MV_編集素材のサブフォルダ（音声ファイル用）
+            self.final_assets_dir / "音声ファイル",
+        ):
+            os.makedirs(path, exist_ok=True)
+        MediaProcessor._dirs_ready.add(key)
+    
+    def process_batch(self, folder_name: str, file_paths: List[Path]):
+        """
+        同じフォルダに追加された複数ファイルをまとめて処理
+        
+        Watchdogのデバウンス期間内に同じフォルダへ追加されたファイルがまとめて渡されます。
+        ファイル同士は独立しているため、処理段階ごとの同時実行数の上限までスレッドで並列に処理します。
+        
+        Args:
+            folder_name: ファイルが追加されたフォルダ名
+            file_paths: 処理するファイルのパスのリスト
+        """
+        cpu_count = os.cpu_count() or 1
+        # (処理, 同時実行数の上限)
+        # 高品質化は1ファイルでも重いエンコードを行うため半分、口パク・素材整理は順に処理する
+        handlers = {
+            self.input_audio_dir.name: (self.process_audio_file, cpu_count),
+            self.input_video_dir.name: (self.process_video_file, cpu_count),
+            self.ai_video_dir.name: (self.trigger_quality_pipeline, max(1, cpu_count // 2)),
+            self.hq_video_dir.name: (self.process_lipsync, 1),
+            self.lipsync_video_dir.name: (self.finalize_assets, 1)
+        }
+        
+        entry = handlers.get(folder_name)
+        if entry is None:
+            self.log_callback(f"自動処理の対象外のフォルダです: {folder_name}", "ERROR")
+            return
+        handler, max_workers = entry
+        with self._stage_slots_lock:
+            slots = self._stage_slots.get(folder_name)
+            if slots is None:
+                slots = self._stage_slots[folder_name] = threading.BoundedSemaphore(max_workers)
+        
+        if len(file_paths) > 1:
+            self.log_callback(f"{folder_name}: {len(file_paths)}個のファイルをまとめて処理します", "INFO")
+        
+        max_workers = min(max_workers, len(file_paths))
+        if max_workers <= 1:
+            for file_path in file_paths:
+                self._run_handler(handler, file_path, slots)
+            return
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mvai-stage") as pool:
+            for file_path in file_paths:
+                pool.submit(self._run_handler, handler, file_path, slots)
+    
+    def _run_handler(self, handler, file_path: Path, slots: threading.BoundedSemaphore):
+        """
+        処理段階の空きを待ってファイルごとの処理を呼び出し、予期しないエラーをログに記録する
+        
+        Args:
+            handler: ファイルごとの処理
+            file_path: 処理するファイルのパス
+            slots: 処理段階の同時実行数を制限するセマフォ（他のバッチと共有）
+        """
+        try:
+            with slots:
+                handler(file_path)
+        except Exception as e:
+            self.log_callback(
+                f"処理中に予期しないエラーが発生しました ({file_path.name}): {str(e)}",
+                "ERROR"
+            )
     
     def process_audio_file(self, file_path: Path):
         """
@@ -71,9 +290,11 @@ class MediaProcessor:
             
             self.log_callback(f"音声ファイルの処理を開始: {file_path.name}", "INFO")
             
+            import librosa
+            
             # 音声ファイルの読み込み
             try:
-                y, sr = librosa.load(str(file_path), sr=None)
+                y, sr = self._load_audio(file_path)
             except Exception as e:
                 self.log_callback(f"音声ファイルの読み込みに失敗しました ({file_path.name}): {str(e)}", "ERROR")
                 return
@@ -82,31 +303,58 @@ class MediaProcessor:
                 self.log_callback(f"音声データが空です: {file_path.name}", "ERROR")
                 return
             
+            # 無音（最大RMSがしきい値未満）の場合はSTFTなどの重い解析を行わずにスキップ
+            y = np.ascontiguousarray(y, dtype=np.float32)
+            max_rms = float(_frame_rms(y, self.BEAT_FRAME_LENGTH, self.BEAT_HOP_LENGTH).max())
+            max_rms_db = 20 * np.log10(max(max_rms, 1e-10))
+            if max_rms_db < self.SILENCE_THRESHOLD_DB:
+                self.log_callback(
+                    f"無音のためBPM解析をスキップしました ({file_path.name}): 最大RMS={max_rms_db:.1f}dBFS",
+                    "WARNING"
+                )
+                # 入力フォルダに残さないよう、01_曲_Input/無音スキップに移動
+                try:
+                    skipped_dir = self.input_audio_dir / "無音スキップ"
+                    dest_path = self._unique_path(skipped_dir, file_path.stem, file_path.suffix)
+                    self._move_file(file_path, dest_path)
+                    self.log_callback(f"ファイルを移動しました: {skipped_dir.name}/{dest_path.name}", "INFO")
+                except Exception as e:
+                    self.log_callback(f"ファイル移動に失敗しました ({file_path.name}): {str(e)}", "ERROR")
+                return
+            
+            # ビート検出はlibrosaの既定の22050Hzで十分な精度が得られるため、高いサンプリングレートは先に落とす
+            if sr > self.BEAT_SAMPLE_RATE:
+                y = librosa.resample(y, orig_sr=sr, target_sr=self.BEAT_SAMPLE_RATE, res_type='soxr_hq')
+                sr = self.BEAT_SAMPLE_RATE
+            
             # BPMの計算
+            # オンセット強度の包絡線を明示的に1回だけ計算してbeat_trackに渡す（他の解析にも再利用できる）
             try:
-                tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
+                y = np.asarray(y, dtype=np.float32)
+                onset_env = librosa.onset.onset_strength(y=y, sr=sr, hop_length=self.BEAT_HOP_LENGTH)
+                tempo, beats = librosa.beat.beat_track(
+                    onset_envelope=onset_env, sr=sr, hop_length=self.BEAT_HOP_LENGTH
+                )
                 bpm = float(tempo)
             except Exception as e:
                 self.log_callback(f"BPM計算に失敗しました ({file_path.name}): {str(e)}", "ERROR")
                 return
             
             # ビートタイミングの取得（秒単位）
-            beat_times = librosa.frames_to_time(beats, sr=sr)
-            
-            # 結果をDataFrameに格納
-            df = pd.DataFrame({
-                'beat_time_seconds': beat_times,
-                'beat_index': range(len(beat_times))
-            })
+            beat_times = librosa.frames_to_time(beats, sr=sr, hop_length=self.BEAT_HOP_LENGTH)
             
             # CSVファイル名の生成（元のファイル名から拡張子を除く）
-            song_name = file_path.stem
-            csv_filename = f"{song_name}_beats.csv"
-            csv_path = self.logs_dir / csv_filename
+            csv_path = self.beat_csv_path(file_path)
+            csv_filename = csv_path.name
             
-            # CSVファイルに保存
+            # CSVファイルに保存（2列の数値のみのため、DataFrameを介さずnumpyで直接書き出す）
             try:
-                df.to_csv(csv_path, index=False, encoding='utf-8-sig')
+                rows = np.column_stack([beat_times, np.arange(len(beat_times))])
+                with open(csv_path, 'w', encoding='utf-8-sig', newline='') as f:
+                    np.savetxt(
+                        f, rows, fmt=['%.6f', '%d'], delimiter=',',
+                        header='beat_time_seconds,beat_index', comments=''
+                    )
             except Exception as e:
                 self.log_callback(f"CSV保存に失敗しました ({csv_filename}): {str(e)}", "ERROR")
                 return
@@ -119,25 +367,43 @@ class MediaProcessor:
             # 処理済みファイルを99_MV_編集素材/音声ファイルに移動
             try:
                 audio_subdir = self.final_assets_dir / "音声ファイル"
-                dest_path = audio_subdir / file_path.name
                 # 同名ファイルが存在する場合は番号を付ける
-                counter = 1
-                while dest_path.exists():
-                    stem = file_path.stem
-                    suffix = file_path.suffix
-                    dest_path = audio_subdir / f"{stem}({counter}){suffix}"
-                    counter += 1
-                
-                shutil.move(str(file_path), str(dest_path))
+                dest_path = self._unique_path(audio_subdir, file_path.stem, file_path.suffix)
+                self._move_file(file_path, dest_path)
                 self.log_callback(f"ファイルを移動しました: {dest_path.name}", "INFO")
             except Exception as e:
                 self.log_callback(f"ファイル移動に失敗しました ({file_path.name}): {str(e)}", "ERROR")
             
         except Exception as e:
-            import traceback
             error_detail = traceback.format_exc()
             self.log_callback(f"音声処理エラー ({file_path.name}): {str(e)}\n{error_detail}", "ERROR")
     
+    def _load_audio(self, file_path: Path):
+        """
+        音声ファイルをモノラルのfloat32波形として読み込む（サンプリングレートは元のまま）
+        
+        soundfileで直接読み込み、対応していない形式（m4a、aacなど）のみlibrosa.loadにフォールバックする。
+        
+        Args:
+            file_path: 音声ファイルのパス
+        
+        Returns:
+            (波形, サンプリングレート)
+        """
+        import soundfile as sf
+        
+        try:
+            y, sr = sf.read(str(file_path), dtype='float32', always_2d=False)
+        except RuntimeError:
+            # LibsndfileError（RuntimeErrorのサブクラス）: libsndfileが対応していない形式
+            import librosa
+            return librosa.load(str(file_path), sr=None)
+        
+        # ステレオ以上はモノラルにダウンミックス
+        if y.ndim == 2:
+            y = y.mean(axis=1)
+        return y, sr
+    
     def process_video_file(self, file_path: Path):
         """
         動画ファイルの処理（シーンチェンジ検出と静止画抽出）
@@ -160,7 +426,7 @@ class MediaProcessor:
             
             # 動画情報の取得
             try:
-                probe = ffmpeg.probe(str(file_path))
+                probe = self._probe(file_path)
             except Exception as e:
                 self.log_callback(f"動画情報の取得に失敗しました ({file_path.name}): {str(e)}", "ERROR")
                 return
@@ -204,37 +470,42 @@ class MediaProcessor:
             # 抽出するタイムスタンプを計算
             timestamps = np.linspace(0, duration, num_frames, endpoint=False)
             
-            # 各タイムスタンプで静止画を抽出
+            # 1回のffmpeg呼び出しで全タイムスタンプの静止画をまとめて抽出
             video_name = file_path.stem
             extracted_count = 0
             
-            for i, timestamp in enumerate(timestamps):
-                try:
-                    output_filename = f"{video_name}_frame_{i+1:03d}.jpg"
-                    output_path = self.still_images_dir / output_filename
-                    
-                    # 同名ファイルが存在する場合は番号を付ける
-                    counter = 1
-                    while output_path.exists():
-                        output_filename = f"{video_name}_frame_{i+1:03d}({counter}).jpg"
-                        output_path = self.still_images_dir / output_filename
-                        counter += 1
-                    
-                    # ffmpegでフレーム抽出
-                    (
-                        ffmpeg
-                        .input(str(file_path), ss=timestamp)
-                        .output(str(output_path), vframes=1, q=2)
-                        .overwrite_output()
-                        .run(quiet=True)
-                    )
-                    
-                    if output_path.exists():
-                        extracted_count += 1
-                    
-                except Exception as e:
-                    self.log_callback(f"フレーム抽出エラー (t={timestamp:.2f}s): {str(e)}", "ERROR")
-                    continue
+            try:
+                extracted_count = self._extract_frames_batch(file_path, video_name, timestamps, fps)
+            except Exception as e:
+                self.log_callback(
+                    f"一括フレーム抽出に失敗したため1枚ずつ抽出します ({file_path.name}): {str(e)}",
+                    "WARNING"
+                )
+                # フォールバック: タイムスタンプごとに抽出
+                for i, timestamp in enumerate(timestamps):
+                    output_path = self._frame_output_path(video_name, i + 1)
+                    try:
+                        # ffmpegでフレーム抽出
+                        # -ssを入力オプションにし-noaccurate_seekで直前のキーフレームへ高速シークする
+                        # （フレーム単位の正確さは失われるが、等間隔サンプリングの代表フレームには十分）
+                        (
+                            ffmpeg
+                            .input(str(file_path), ss=timestamp, noaccurate_seek=None)
+                            .output(str(output_path), vframes=1, an=None, sn=None, **{"q:v": 2})
+                            .global_args("-hide_banner", "-loglevel", "error")
+                            .overwrite_output()
+                            .run(quiet=True)
+                        )
+                        
+                        if output_path.stat().st_size > 0:
+                            extracted_count += 1
+                        else:
+                            self._discard_if_empty(output_path)
+                        
+                    except Exception as e:
+                        self._discard_if_empty(output_path)
+                        self.log_callback(f"フレーム抽出エラー (t={timestamp:.2f}s): {str(e)}", "ERROR")
+                        continue
             
             if extracted_count > 0:
                 self.log_callback(
@@ -248,10 +519,478 @@ class MediaProcessor:
                 )
             
         except Exception as e:
-            import traceback
             error_detail = traceback.format_exc()
             self.log_callback(f"動画処理エラー ({file_path.name}): {str(e)}\n{error_detail}", "ERROR")
     
+    def _unique_path(self, directory: Path, stem: str, suffix: str) -> Path:
+        """
+        重複しない出力ファイル名を確保する
+        
+        O_CREAT|O_EXCLで空ファイルを作成して名前を予約するため、存在確認と作成の間に
+        並列実行中の他の処理が同名ファイルを作成しても衝突しません。
+        同名ファイルが存在する場合は`(1)`、`(2)`...の番号を付けます。
+        
+        Args:
+            directory: 出力先フォルダ
+            stem: ファイル名（拡張子なし）
+            suffix: 拡張子（ドット付き）
+        
+        Returns:
+            予約した出力ファイルのパス（空ファイル。上書きして使用する）
+        """
+        for counter in itertools.count():
+            path = directory / (f"{stem}{suffix}" if counter == 0 else f"{stem}({counter}){suffix}")
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                continue
+            os.close(fd)
+            return path
+    
+    def _partial_path(self, directory: Path, stem: str, suffix: str) -> Path:
+        """
+        監視フォルダへの出力を書き込む一時ファイルを確保する
+        
+        隠しファイル（.{stem}.part{suffix}）として予約するため、書き込み中のファイルを
+        Watchdogが処理対象として検知しません。書き込み完了後に_publishで最終的な名前にします。
+        
+        Args:
+            directory: 出力先フォルダ
+            stem: 最終的なファイル名（拡張子なし）
+            suffix: 拡張子（ドット付き。ffmpegが出力形式を判定できるよう一時ファイルにも付ける）
+        
+        Returns:
+            予約した一時ファイルのパス（空ファイル。上書きして使用する）
+        """
+        return self._unique_path(directory, f".{stem}.part", suffix)
+    
+    def _publish(self, partial_path: Path, stem: str, suffix: str) -> Path:
+        """
+        書き込みが完了した一時ファイルを重複しない最終的な名前にする
+        
+        ハードリンクを作成してから一時ファイルを削除するため、同名のファイルを上書きせず、
+        Watchdogには書き込みが完了したファイルの作成として通知されます。
+        同名ファイルが存在する場合は`(1)`、`(2)`...の番号を付けます。
+        
+        Args:
+            partial_path: _partial_pathで確保した一時ファイルのパス
+            stem: 最終的なファイル名（拡張子なし）
+            suffix: 拡張子（ドット付き）
+        
+        Returns:
+            最終的なファイルのパス
+        """
+        directory = partial_path.parent
+        for counter in itertools.count():
+            path = directory / (f"{stem}{suffix}" if counter == 0 else f"{stem}({counter}){suffix}")
+            try:
+                os.link(partial_path, path)
+            except FileExistsError:
+                continue
+            except OSError:
+                # ハードリンクに対応しないドライブでは、存在を確認してから名前を変更する
+                if path.exists():
+                    continue
+                os.replace(partial_path, path)
+                return path
+            partial_path.unlink()
+            return path
+    
+    def _discard_partial(self, partial_path: Path):
+        """書き込みに失敗した一時ファイルを削除"""
+        try:
+            partial_path.unlink()
+        except OSError:
+            pass
+    
+    def _unique_dir(self, directory: Path, name: str) -> Path:
+        """
+        重複しないフォルダを作成する（同名フォルダが存在する場合は`(1)`、`(2)`...の番号を付ける）
+        
+        Args:
+            directory: 親フォルダ
+            name: フォルダ名
+        
+        Returns:
+            作成したフォルダのパス
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        for counter in itertools.count():
+            path = directory / (name if counter == 0 else f"{name}({counter})")
+            try:
+                path.mkdir()
+            except FileExistsError:
+                continue
+            return path
+    
+    def _move_file(self, src: Path, dest: Path):
+        """
+        ファイルを移動する（_unique_pathで予約したパスへ置き換える）
+        
+        同じドライブ内ではos.replaceで1回のリネームとして移動し、
+        別のドライブへの移動のみshutil.moveでコピーする。
+        
+        Args:
+            src: 移動元のパス
+            dest: 移動先のパス
+        """
+        try:
+            os.replace(src, dest)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(str(src), str(dest))
+    
+    def _fast_clone(self, src: Path, dest: Path):
+        """
+        処理済みの動画をデータのコピーなしで複製する
+        
+        ハードリンク → リフリンク（Btrfs/XFS/APFSなどのコピーオンライト）→ 通常のコピーの順に試す。
+        処理済みの素材は以降書き換えないため、ハードリンクで実体を共有しても問題ない。
+        
+        Args:
+            src: 複製元のパス
+            dest: 複製先のパス（存在しないこと）
+        """
+        try:
+            os.link(src, dest)
+            return
+        except OSError as e:
+            # 複製先が既にある場合以外は、ハードリンクに対応しないドライブ（FAT32/exFAT/ネットワーク
+            # ドライブなど。Windowsではエラー番号が不定）とみなしてコピーする
+            if e.errno == errno.EEXIST:
+                raise
+        
+        if sys.platform.startswith('linux') or sys.platform == 'darwin':
+            reflink_flag = '--reflink=always' if sys.platform.startswith('linux') else '-c'
+            try:
+                result = subprocess.run(['cp', reflink_flag, str(src), str(dest)], capture_output=True)
+                if result.returncode == 0:
+                    return
+            except OSError:
+                pass
+        
+        shutil.copy2(str(src), str(dest))
+    
+    def _copy_file(self, src: Path, dest: Path):
+        """
+        ファイルを別の実体としてコピーする（メタデータもコピーするshutil.copy2相当）
+        
+        Linuxではos.copy_file_rangeでカーネル内でコピーする（Btrfs/XFSなどではリフリンクになる）。
+        対応していない環境・ファイルシステムではshutil.copy2でコピーする。
+        
+        Args:
+            src: コピー元のパス
+            dest: コピー先のパス
+        """
+        if hasattr(os, 'copy_file_range'):
+            try:
+                with open(src, 'rb') as fsrc, open(dest, 'wb') as fdst:
+                    while os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30) > 0:
+                        pass
+                shutil.copystat(str(src), str(dest))
+                return
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+        
+        shutil.copy2(str(src), str(dest))
+    
+    def _discard_if_empty(self, path: Path):
+        """_unique_pathで予約したまま書き込まれなかった空ファイルを削除"""
+        try:
+            if path.stat().st_size == 0:
+                path.unlink()
+        except OSError:
+            pass
+    
+    def _frame_output_path(self, video_name: str, index: int) -> Path:
+        """
+        静止画の出力パスを確保（同名ファイルが存在する場合は番号を付ける）
+        
+        Args:
+            video_name: 動画ファイル名（拡張子なし）
+            index: フレーム番号（1始まり）
+        
+        Returns:
+            予約した出力先のパス
+        """
+        return self._unique_path(self.still_images_dir, f"{video_name}_frame_{index:03d}", ".jpg")
+    
+    def _extract_frames_batch(self, file_path: Path, video_name: str,
+                              timestamps, fps: float) -> int:
+        """
+        selectフィルタで指定タイムスタンプのフレームを1回のffmpeg呼び出しで抽出
+        
+        コンテナのオープン・シークをタイムスタンプごとに繰り返さず、1回のデコードで済ませる。
+        まずキーフレームのみをデコードして各タイムスタンプ以降の最初のキーフレームを抽出し
+        （代表フレームのため時刻の正確さは問わない）、キーフレームの間隔が広く枚数が足りない場合は
+        全フレームをデコードしてフレーム番号で抽出する。
+        
+        Args:
+            file_path: 動画ファイルのパス
+            video_name: 動画ファイル名（拡張子なし）
+            timestamps: 抽出するタイムスタンプ（秒）
+            fps: 動画のフレームレート
+        
+        Returns:
+            抽出した静止画の枚数
+        
+        Raises:
+            ffmpeg.Error: ffmpegの実行に失敗した場合
+        """
+        # 各タイムスタンプ以降で、まだ選択していない最初のフレーム
+        # （prev_selected_tは未選択の間NaNで、NaNとの比較は0になる）
+        keyframe_expr = "+".join(
+            f"gte(t\\,{ts:.3f})*not(gte(prev_selected_t\\,{ts:.3f}))" for ts in timestamps
+        )
+        # eq(t,...)は浮動小数点の一致が必要なため、フレーム番号で選択する
+        frame_numbers = sorted({int(round(ts * fps)) for ts in timestamps})
+        frame_expr = "+".join(f"eq(n\\,{n})" for n in frame_numbers)
+        
+        # 一時的な連番ファイルに出力してから、既存の命名規則でリネームする
+        tmp_dir = Path(tempfile.mkdtemp(prefix=".frames_", dir=self.still_images_dir))
+        try:
+            try:
+                frames = self._run_frame_select(file_path, tmp_dir, keyframe_expr, keyframes_only=True)
+            except ffmpeg.Error:
+                frames = []
+            if len(frames) < len(frame_numbers):
+                for frame in tmp_dir.glob("frame_*.jpg"):
+                    frame.unlink()
+                frames = self._run_frame_select(file_path, tmp_dir, frame_expr, keyframes_only=False)
+            if not frames:
+                raise ffmpeg.Error("ffmpeg", b"", b"no frames extracted")
+            
+            for i, frame in enumerate(frames):
+                os.replace(frame, self._frame_output_path(video_name, i + 1))
+            return len(frames)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    
+    def _run_frame_select(self, file_path: Path, tmp_dir: Path, select_expr: str,
+                          keyframes_only: bool) -> List[Path]:
+        """
+        selectフィルタに一致するフレームをtmp_dirに連番のJPEG（MJPEG）で出力
+        
+        Args:
+            file_path: 動画ファイルのパス
+            tmp_dir: 出力先の一時フォルダ
+            select_expr: selectフィルタの式
+            keyframes_only: キーフレームのみをデコードするかどうか（-skip_frame nokey）
+        
+        Returns:
+            出力したフレームのパス（順番通り）
+        """
+        input_args = {'skip_frame': 'nokey'} if keyframes_only else {}
+        (
+            ffmpeg
+            .input(str(file_path), **input_args)
+            .output(
+                str(tmp_dir / "frame_%03d.jpg"),
+                vf=f"select={select_expr}",
+                vsync="passthrough",
+                an=None,
+                **{"c:v": "mjpeg", "q:v": 2}
+            )
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        return sorted(tmp_dir.glob("frame_*.jpg"))
+    
+    def _probe(self, file_path: Path) -> dict:
+        """
+        ffmpeg.probeの結果を取得（パス・更新時刻・サイズが同じファイルはキャッシュを返す）
+        
+        Args:
+            file_path: メディアファイルのパス
+        
+        Returns:
+            ffprobeの結果（キャッシュと共有するため変更しないこと）
+        
+        Raises:
+            ffmpeg.Error: ffprobeの実行に失敗した場合
+        """
+        stat = os.stat(file_path)
+        key = (str(file_path), stat.st_mtime_ns, stat.st_size)
+        with self._probe_lock:
+            probe = self._probe_cache.get(key)
+            if probe is not None:
+                self._probe_cache.move_to_end(key)
+                return probe
+        
+        probe = ffmpeg.probe(str(file_path))
+        with self._probe_lock:
+            self._probe_cache[key] = probe
+            if len(self._probe_cache) > self.PROBE_CACHE_SIZE:
+                self._probe_cache.popitem(last=False)
+        return probe
+    
+    def _probe_clip(self, file_path: Path) -> tuple:
+        """
+        動画クリップの長さと映像ストリームの情報を取得
+        
+        PyAVがインストールされている場合はffprobeを起動せずにコンテナのヘッダーのみ読み込み、
+        ない場合やPyAVで読み込めなかった場合は_probeにフォールバックします。
+        
+        Args:
+            file_path: 動画ファイルのパス
+        
+        Returns:
+            (長さ（秒）, 映像ストリームの情報（width・height・r_frame_rate）またはNone) のタプル
+        
+        Raises:
+            ffmpeg.Error: フォールバックしたffprobeの実行に失敗した場合
+        """
+        if av is not None:
+            try:
+                with av.open(str(file_path)) as container:
+                    if container.duration is not None:
+                        video = None
+                        if container.streams.video:
+                            stream = container.streams.video[0]
+                            rate = stream.guessed_rate or stream.average_rate
+                            video = {
+                                'width': stream.codec_context.width,
+                                'height': stream.codec_context.height,
+                                'r_frame_rate': f"{rate.numerator}/{rate.denominator}" if rate else '24/1'
+                            }
+                        return float(container.duration) / av.time_base, video
+            except Exception:
+                pass
+        
+        probe = self._probe(file_path)
+        video = next((s for s in probe['streams'] if s.get('codec_type') == 'video'), None)
+        return float(probe['format'].get('duration', 0)), video
+    
+    def _get_hw_encoder(self) -> Optional[str]:
+        """
+        使用できるハードウェアエンコーダー名を取得（初回のみffmpeg -encodersで確認）
+        
+        Returns:
+            エンコーダー名（h264_nvenc、h264_qsv）。ない場合はNone
+        """
+        if self._hw_encoder is None:
+            self._hw_encoder = ''
+            try:
+                result = subprocess.run(
+                    ['ffmpeg', '-hide_banner', '-encoders'],
+                    capture_output=True, text=True, timeout=10
+                )
+                encoders = result.stdout.split()
+                for name in self.HW_ENCODERS:
+                    if name in encoders:
+                        self._hw_encoder = name
+                        break
+            except (OSError, subprocess.SubprocessError):
+                pass
+        return self._hw_encoder or None
+    
+    def _hq_encoder_args(self, encoder: Optional[str]) -> dict:
+        """
+        高品質化のエンコード設定を取得
+        
+        Args:
+            encoder: ハードウェアエンコーダー名（Noneの場合はlibx264）
+        
+        Returns:
+            ffmpeg-pythonのoutputに渡す引数
+        """
+        if encoder == 'h264_nvenc':
+            # 固定品質のVBR（cqはlibx264のcrf 18相当の画質を目安に設定）
+            return {'vcodec': encoder, 'preset': 'p6', 'rc': 'vbr', 'cq': 20, 'b:v': '0'}
+        if encoder == 'h264_qsv':
+            return {'vcodec': encoder, 'preset': 'slow', 'global_quality': 20}
+        return {
+            'vcodec': 'libx264',
+            'preset': 'slow',  # 高品質プリセット
+            'crf': 18,  # 高品質（18-23が推奨、低いほど高品質）
+            # フレーム並列（スライス並列は画質が落ちるため無効）、先読みも並列化
+            'x264opts': 'threads=auto:sliced-threads=0:lookahead-threads=2'
+        }
+    
+    def _standard_encoder_args(self, encoder: Optional[str]) -> dict:
+        """
+        クリップ結合・MV生成のエンコード設定を取得
+        
+        Args:
+            encoder: ハードウェアエンコーダー名（Noneの場合はlibx264）
+        
+        Returns:
+            ffmpeg-pythonのoutputに渡す引数
+        """
+        if encoder == 'h264_nvenc':
+            # 固定品質のVBR（cqはlibx264のcrf 23相当の画質を目安に設定）
+            return {'vcodec': encoder, 'preset': 'p4', 'rc': 'vbr', 'cq': 23, 'b:v': '0'}
+        if encoder == 'h264_qsv':
+            return {'vcodec': encoder, 'preset': 'medium', 'global_quality': 23}
+        return {'vcodec': 'libx264', 'preset': 'medium', 'crf': 23}
+    
+    @contextmanager
+    def _encode_threads(self):
+        """
+        高品質化エンコード1回あたりのスレッド数を取得
+        
+        同時に実行中のエンコードでCPUコアを分け合い、エンコーダー・フィルターのスレッド数の
+        合計がコア数を大きく超えないようにします。
+        
+        使用例:
+            with self._encode_threads() as threads:
+                ...
+        """
+        cpu_count = os.cpu_count() or 1
+        with MediaProcessor._encode_lock:
+            MediaProcessor._active_encodes += 1
+            threads = max(1, cpu_count // MediaProcessor._active_encodes)
+        try:
+            yield threads
+        finally:
+            with MediaProcessor._encode_lock:
+                MediaProcessor._active_encodes -= 1
+    
+    def _run_encode(self, build_output, encoder_args) -> Optional[str]:
+        """
+        GPUのハードウェアエンコーダーを優先してエンコードを実行（失敗時はlibx264で再実行）
+        
+        Args:
+            build_output: エンコード設定の辞書を受け取り、実行するffmpeg-pythonの出力を返す関数
+            encoder_args: エンコーダー名を受け取り、エンコード設定の辞書を返す関数
+        
+        Returns:
+            使用したハードウェアエンコーダー名（libx264の場合はNone）
+        
+        Raises:
+            ffmpeg.Error: libx264でもエンコードに失敗した場合
+        """
+        hw_encoder = self._get_hw_encoder()
+        for encoder in ([hw_encoder] if hw_encoder else []) + [None]:
+            try:
+                build_output(encoder_args(encoder)).overwrite_output().run(quiet=True)
+                if encoder is not None:
+                    self._hw_init_failures = 0
+                return encoder
+            except ffmpeg.Error as e:
+                if encoder is None:
+                    raise
+                stderr = e.stderr.decode('utf-8', errors='ignore') if e.stderr else ''
+                if any(marker in stderr for marker in self.HW_ENCODER_INIT_ERRORS):
+                    self._hw_init_failures += 1
+                if (any(marker in stderr for marker in self.HW_ENCODER_UNAVAILABLE_ERRORS)
+                        or self._hw_init_failures >= self.HW_ENCODER_MAX_INIT_FAILURES):
+                    # ドライバーやGPUがない環境ではエンコーダーが一覧にあっても失敗するため、以降は使用しない
+                    self._hw_encoder = ''
+                    self.log_callback(
+                        f"ハードウェアエンコーダー（{encoder}）が使用できないため、libx264でエンコードします",
+                        "WARNING"
+                    )
+                else:
+                    # 同時セッション数の上限や入力ファイルの破損など、一時的・エンコーダー以外の原因の
+                    # 可能性があるため今回のみlibx264で再実行
+                    self.log_callback(
+                        f"ハードウェアエンコーダー（{encoder}）でのエンコードに失敗したため、libx264で再実行します",
+                        "WARNING"
+                    )
+    
     def trigger_quality_pipeline(self, file_path: Path):
         """
         高品質化パイプライン（Upscale/補間）
@@ -276,7 +1015,7 @@ class MediaProcessor:
             
             # 動画情報の取得
             try:
-                probe = ffmpeg.probe(str(file_path))
+                probe = self._probe(file_path)
             except Exception as e:
                 self.log_callback(f"動画情報の取得に失敗しました ({file_path.name}): {str(e)}", "ERROR")
                 return
@@ -294,15 +1033,8 @@ class MediaProcessor:
             
             # 出力ファイル名の生成
             video_name = file_path.stem
-            output_filename = f"{video_name}_hq{file_path.suffix}"
-            output_path = self.hq_video_dir / output_filename
-            
-            # 同名ファイルが存在する場合は番号を付ける
-            counter = 1
-            while output_path.exists():
-                output_filename = f"{video_name}_hq({counter}){file_path.suffix}"
-                output_path = self.hq_video_dir / output_filename
-                counter += 1
+            # 書き込み中は隠しファイルに出力し、完了後に最終的な名前にする（同名ファイルが存在する場合は番号を付ける）
+            output_path = self._partial_path(self.hq_video_dir, f"{video_name}_hq", file_path.suffix)
             
             # FFmpegを使用した高品質化処理
             # 1. 解像度のアップスケール（2倍、または元の解像度を維持）
@@ -383,7 +1115,12 @@ class MediaProcessor:
                     scaled = input_stream.filter('scale', target_width, target_height)
                     
                     # フレームレート補間（必要に応じて）
-                    if target_fps > original_fps:
+                    if (target_fps > original_fps and self.hq_interpolation != 'best'
+                            and target_fps <= original_fps * 2):
+                        # fastモード: 前後フレームのブレンドで補間（minterpolateより大幅に軽いが、
+                        # 動きの大きい場面では残像が出る。2倍を超える補間は下のminterpolateを使用）
+                        video_stream = scaled.filter('framerate', fps=target_fps)
+                    elif target_fps > original_fps:
                         # minterpolateフィルターを使用（モーションベース補間）
                         # mi_mode=mci: モーションベース補間（高品質）
                         # mc_mode=aobmc: 適応的オーバーラップブロックモーション補償
@@ -399,34 +1136,34 @@ class MediaProcessor:
                     else:
                         video_stream = scaled
                     
-                    # エンコード設定
-                    (
-                        video_stream
-                        .output(
-                            str(output_path),
-                            vcodec='libx264',
-                            preset='slow',  # 高品質プリセット
-                            crf=18,  # 高品質（18-23が推奨、低いほど高品質）
-                            pix_fmt='yuv420p',
-                            movflags='faststart',  # Web再生最適化
-                            r=target_fps  # 出力フレームレートを明示的に指定
+                    # エンコード設定（GPUのハードウェアエンコーダーがあれば優先し、失敗時はlibx264で再実行）
+                    # スレッド数は同時に実行中の高品質化エンコードでCPUコアを分け合う（1件のみの場合は全コア）
+                    with self._encode_threads() as threads:
+                        self._run_encode(
+                            lambda encoder_args: (
+                                video_stream
+                                .output(
+                                    str(output_path),
+                                    pix_fmt='yuv420p',
+                                    movflags='faststart',  # Web再生最適化
+                                    r=target_fps,  # 出力フレームレートを明示的に指定
+                                    threads=threads,
+                                    **encoder_args
+                                )
+                                # scale・補間は1つのフィルターグラフで処理されるため、その並列数も同じ数に設定
+                                .global_args(
+                                    '-filter_threads', str(threads),
+                                    '-filter_complex_threads', str(threads)
+                                )
+                            ),
+                            self._hq_encoder_args
                         )
-                        .overwrite_output()
-                        .run(quiet=True)
-                    )
-                    
-                    # ファイル生成を待つ（最大5秒）
-                    import time
-                    wait_time = 0
-                    max_wait = 5
-                    while not output_path.exists() and wait_time < max_wait:
-                        time.sleep(0.5)
-                        wait_time += 0.5
                     
-                    # 生成されたファイルを確認
+                    # 生成されたファイルを確認（run()はffmpegの終了まで待つため、ここで書き込みは完了している）
                     if output_path.exists():
                         file_size = output_path.stat().st_size
                         if file_size > 0:
+                            output_path = self._publish(output_path, f"{video_name}_hq", file_path.suffix)
                             self.log_callback(
                                 f"✅ 高品質化処理完了: {output_path.name} ({file_size / (1024*1024):.2f} MB)",
                                 "SUCCESS"
@@ -440,15 +1177,9 @@ class MediaProcessor:
                             if "使用済み素材" not in file_path.parts:
                                 try:
                                     used_dir = self.ai_video_dir / "使用済み素材"
-                                    used_path = used_dir / file_path.name
-                                    counter = 1
-                                    while used_path.exists():
-                                        stem = file_path.stem
-                                        suffix = file_path.suffix
-                                        used_path = used_dir / f"{stem}({counter}){suffix}"
-                                        counter += 1
                                     if file_path.exists():
-                                        shutil.move(str(file_path), str(used_path))
+                                        used_path = self._unique_path(used_dir, file_path.stem, file_path.suffix)
+                                        self._move_file(file_path, used_path)
                                         self.log_callback(f"元ファイルを移動しました: {used_path.name}", "INFO")
                                 except Exception as e:
                                     self.log_callback(f"元ファイルの移動に失敗しました: {str(e)}", "WARNING")
@@ -491,7 +1222,6 @@ class MediaProcessor:
                         except:
                             pass
                 except Exception as e:
-                    import traceback
                     error_detail = traceback.format_exc()
                     self.log_callback(
                         f"❌ 高品質化処理エラー ({file_path.name}): {str(e)}\n{error_detail[:500]}",
@@ -505,11 +1235,12 @@ class MediaProcessor:
                             pass
                     
             except Exception as e:
+                if output_path.name.startswith('.'):
+                    self._discard_partial(output_path)
                 self.log_callback(f"FFmpeg処理エラー ({file_path.name}): {str(e)}", "ERROR")
                 return
             
         except Exception as e:
-            import traceback
             error_detail = traceback.format_exc()
             self.log_callback(
                 f"高品質化パイプラインエラー ({file_path.name}): {str(e)}\n{error_detail}",
@@ -540,15 +1271,8 @@ class MediaProcessor:
             
             # 出力ファイル名の生成
             video_name = file_path.stem
-            output_filename = f"{video_name}_lipsync{file_path.suffix}"
-            output_path = self.lipsync_video_dir / output_filename
-            
-            # 同名ファイルが存在する場合は番号を付ける
-            counter = 1
-            while output_path.exists():
-                output_filename = f"{video_name}_lipsync({counter}){file_path.suffix}"
-                output_path = self.lipsync_video_dir / output_filename
-                counter += 1
+            # 書き込み中は隠しファイルに出力し、完了後に最終的な名前にする（同名ファイルが存在する場合は番号を付ける）
+            output_path = self._partial_path(self.lipsync_video_dir, f"{video_name}_lipsync", file_path.suffix)
             
             # リップシンク処理の実装
             # 注意: 実際のリップシンク処理には専用ツール（Wav2Lip、SadTalker等）が必要です
@@ -561,7 +1285,8 @@ class MediaProcessor:
                 # - SadTalker: https://github.com/OpenTalker/SadTalker
                 # - LivePortrait: https://github.com/KwaiVGI/LivePortrait
                 
-                shutil.copy2(str(file_path), str(output_path))
+                self._copy_file(file_path, output_path)
+                output_path = self._publish(output_path, f"{video_name}_lipsync", file_path.suffix)
                 
                 if output_path.exists():
                     self.log_callback(
@@ -575,14 +1300,8 @@ class MediaProcessor:
                     if "使用済み素材" not in file_path.parts:
                         try:
                             used_dir = self.hq_video_dir / "使用済み素材"
-                            used_path = used_dir / file_path.name
-                            counter = 1
-                            while used_path.exists():
-                                stem = file_path.stem
-                                suffix = file_path.suffix
-                                used_path = used_dir / f"{stem}({counter}){suffix}"
-                                counter += 1
-                            shutil.move(str(file_path), str(used_path))
+                            used_path = self._unique_path(used_dir, file_path.stem, file_path.suffix)
+                            self._move_file(file_path, used_path)
                             self.log_callback(f"元ファイルを移動しました: {used_path.name}", "INFO")
                         except Exception as e:
                             self.log_callback(f"元ファイルの移動に失敗しました: {str(e)}", "WARNING")
@@ -595,11 +1314,12 @@ class MediaProcessor:
                     )
                     
             except Exception as e:
+                if output_path.name.startswith('.'):
+                    self._discard_partial(output_path)
                 self.log_callback(f"リップシンク処理エラー ({file_path.name}): {str(e)}", "ERROR")
                 return
             
         except Exception as e:
-            import traceback
             error_detail = traceback.format_exc()
             self.log_callback(
                 f"リップシンク処理エラー ({file_path.name}): {str(e)}\n{error_detail}",
@@ -630,7 +1350,7 @@ class MediaProcessor:
             
             # 動画情報の取得
             try:
-                probe = ffmpeg.probe(str(file_path))
+                probe = self._probe(file_path)
             except Exception as e:
                 self.log_callback(f"動画情報の取得に失敗しました ({file_path.name}): {str(e)}", "ERROR")
                 return
@@ -648,113 +1368,73 @@ class MediaProcessor:
             video_name = file_path.stem
             
             # セットフォルダの作成（動画ファイル名をベースに）
-            set_folder = self.final_assets_dir / video_name
-            
             # 同名フォルダが存在する場合は番号を付ける
-            counter = 1
-            original_set_folder = set_folder
-            while set_folder.exists():
-                set_folder = self.final_assets_dir / f"{video_name}({counter})"
-                counter += 1
-            
-            set_folder.mkdir(parents=True, exist_ok=True)
+            set_folder = self._unique_dir(self.final_assets_dir, video_name)
             self.log_callback(f"セットフォルダを作成しました: {set_folder.name}", "INFO")
             
-            # 動画ファイルをセットフォルダに移動
+            # 動画ファイルをセットフォルダに移動（作成したばかりのフォルダのため名前は重複しない）
             dest_video_path = set_folder / file_path.name
             
-            # 同名ファイルが存在する場合は番号を付ける
-            counter = 1
-            while dest_video_path.exists():
-                stem = file_path.stem
-                suffix = file_path.suffix
-                dest_video_path = set_folder / f"{stem}({counter}){suffix}"
-                counter += 1
-            
             try:
                 # 使用済み素材フォルダの動画かどうかをチェック
                 if "使用済み素材" in file_path.parts:
                     # 使用済み素材フォルダの動画は、そのままコピーする（移動しない）
-                    shutil.copy2(str(file_path), str(dest_video_path))
+                    self._fast_clone(file_path, dest_video_path)
                     self.log_callback(f"動画ファイルをコピーしました: {dest_video_path.name} (使用済み素材フォルダから)", "INFO")
                 else:
                     # 通常の動画は、使用済み素材フォルダに移動してからコピー
                     used_dir = self.lipsync_video_dir / "使用済み素材"
-                    used_path = used_dir / file_path.name
-                    counter = 1
-                    while used_path.exists():
-                        stem = file_path.stem
-                        suffix = file_path.suffix
-                        used_path = used_dir / f"{stem}({counter}){suffix}"
-                        counter += 1
+                    used_path = self._unique_path(used_dir, file_path.stem, file_path.suffix)
                     
                     # まず使用済み素材フォルダに移動
-                    shutil.move(str(file_path), str(used_path))
+                    self._move_file(file_path, used_path)
                     self.log_callback(f"元ファイルを移動しました: {used_path.name}", "INFO")
                     
                     # その後、セットフォルダにコピー
-                    shutil.copy2(str(used_path), str(dest_video_path))
+                    self._fast_clone(used_path, dest_video_path)
                     self.log_callback(f"動画ファイルをコピーしました: {dest_video_path.name}", "INFO")
             except Exception as e:
                 self.log_callback(f"ファイル移動に失敗しました ({file_path.name}): {str(e)}", "ERROR")
                 return
             
             # XMLメタデータの生成（セットフォルダに保存）
-            xml_filename = f"{video_name}_metadata.xml"
-            xml_path = set_folder / xml_filename
-            
-            # 同名XMLが存在する場合は番号を付ける
-            counter = 1
-            while xml_path.exists():
-                xml_filename = f"{video_name}_metadata({counter}).xml"
-                xml_path = set_folder / xml_filename
-                counter += 1
+            # 作成したばかりのセットフォルダのため名前は重複しない
+            xml_path = set_folder / f"{video_name}_metadata.xml"
             
             try:
-                # XMLメタデータの生成
-                import xml.etree.ElementTree as ET
-                from datetime import datetime
-                
-                root = ET.Element("MVAsset")
-                root.set("version", "1.0")
-                
-                # 基本情報
-                info = ET.SubElement(root, "Info")
-                ET.SubElement(info, "FileName").text = dest_video_path.name
-                ET.SubElement(info, "OriginalFileName").text = file_path.name
-                ET.SubElement(info, "ProcessedDate").text = datetime.now().isoformat()
+                # XMLメタデータの生成（固定の構造のため、テンプレートに値を埋め込んで1回で書き出す）
+                def text(value) -> str:
+                    return escape(str(value))
                 
-                # 動画情報
-                if video_info:
-                    video_elem = ET.SubElement(root, "Video")
-                    ET.SubElement(video_elem, "Codec").text = video_info.get('codec_name', 'unknown')
-                    ET.SubElement(video_elem, "Width").text = str(video_info.get('width', 0))
-                    ET.SubElement(video_elem, "Height").text = str(video_info.get('height', 0))
-                    ET.SubElement(video_elem, "FrameRate").text = video_info.get('r_frame_rate', 'unknown')
-                    ET.SubElement(video_elem, "Duration").text = probe['format'].get('duration', '0')
-                    ET.SubElement(video_elem, "Bitrate").text = str(video_info.get('bit_rate', 0))
+                video_xml = _XML_VIDEO_TEMPLATE.format(
+                    codec=text(video_info.get('codec_name', 'unknown')),
+                    width=text(video_info.get('width', 0)),
+                    height=text(video_info.get('height', 0)),
+                    frame_rate=text(video_info.get('r_frame_rate', 'unknown')),
+                    duration=text(probe['format'].get('duration', '0')),
+                    bitrate=text(video_info.get('bit_rate', 0))
+                ) if video_info else ""
+                audio_xml = _XML_AUDIO_TEMPLATE.format(
+                    codec=text(audio_info.get('codec_name', 'unknown')),
+                    sample_rate=text(audio_info.get('sample_rate', 0)),
+                    channels=text(audio_info.get('channels', 0)),
+                    bitrate=text(audio_info.get('bit_rate', 0))
+                ) if audio_info else ""
+                now = datetime.now().isoformat()
                 
-                # 音声情報
-                if audio_info:
-                    audio_elem = ET.SubElement(root, "Audio")
-                    ET.SubElement(audio_elem, "Codec").text = audio_info.get('codec_name', 'unknown')
-                    ET.SubElement(audio_elem, "SampleRate").text = str(audio_info.get('sample_rate', 0))
-                    ET.SubElement(audio_elem, "Channels").text = str(audio_info.get('channels', 0))
-                    ET.SubElement(audio_elem, "Bitrate").text = str(audio_info.get('bit_rate', 0))
-                
-                # 処理履歴
-                history = ET.SubElement(root, "ProcessingHistory")
-                ET.SubElement(history, "QualityEnhancement").text = "Applied"
-                ET.SubElement(history, "Lipsync").text = "Applied"
-                ET.SubElement(history, "Finalized").text = datetime.now().isoformat()
-                
-                # XMLファイルに書き込み
-                tree = ET.ElementTree(root)
-                ET.indent(tree, space="  ")
-                tree.write(xml_path, encoding='utf-8', xml_declaration=True)
+                xml_path.write_bytes(
+                    _XML_TEMPLATE.format(
+                        file_name=text(dest_video_path.name),
+                        original_file_name=text(file_path.name),
+                        processed_date=now,
+                        video=video_xml,
+                        audio=audio_xml,
+                        finalized=now
+                    ).encode('utf-8')
+                )
                 
                 self.log_callback(
-                    f"XMLメタデータを生成しました: {xml_filename}",
+                    f"XMLメタデータを生成しました: {xml_path.name}",
                     "SUCCESS"
                 )
                 
@@ -767,36 +1447,72 @@ class MediaProcessor:
             )
             
         except Exception as e:
-            import traceback
             error_detail = traceback.format_exc()
             self.log_callback(
                 f"最終処理エラー ({file_path.name}): {str(e)}\n{error_detail}",
                 "ERROR"
             )
     
-    def generate_thumbnail(self, file_path: Path, timestamp: float = 1.0) -> Optional[Path]:
+    def _thumbnail_cmd(self, file_path: Path, thumbnail_path: Path, timestamp: float,
+                       width: int, keyframes_only: bool = True) -> List[str]:
         """
-        動画からサムネイル画像を生成
+        サムネイルを1枚抽出するffmpegコマンドを作成
+        
+        入力側の-ssと-noaccurate_seekで直前のキーフレームへ高速シークし、
+        -skip_frame nokeyでキーフレームのみをデコードする（シーク位置までの全フレームをデコードしない）。
+        
+        Args:
+            file_path: 動画ファイルのパス
+            thumbnail_path: 出力するJPEGのパス
+            timestamp: 抽出する時刻（秒）
+            width: 出力幅（px）
+            keyframes_only: キーフレームのみをデコードするかどうか
+        
+        Returns:
+            ffmpegのコマンドライン
+        """
+        cmd = ['ffmpeg', '-v', 'error', '-ss', str(timestamp), '-noaccurate_seek']
+        if keyframes_only:
+            cmd += ['-skip_frame', 'nokey']
+        cmd += [
+            '-i', str(file_path),
+            '-an',
+            '-vf', f'scale={width}:-2',
+            '-frames:v', '1',
+            '-q:v', str(self.THUMBNAIL_QUALITY),
+            '-y',  # 上書き
+            str(thumbnail_path)
+        ]
+        return cmd
+    
+    def generate_thumbnail(self, file_path: Path, timestamp: float = 1.0,
+                           width: int = THUMBNAIL_WIDTH) -> Optional[Path]:
+        """
+        動画からサムネイル画像を生成（表示サイズのJPEGのみを出力）
         
         Args:
             file_path: 動画ファイルのパス
             timestamp: サムネイルを抽出する時刻（秒）
+            width: 出力幅（px、高さはアスペクト比を保って偶数に丸める）
         
         Returns:
             生成されたサムネイル画像のパス、またはNone
         """
         try:
-            if not file_path.exists():
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
                 return None
             
             # 一時ディレクトリにサムネイルを保存
             temp_dir = Path(tempfile.gettempdir()) / "mvai_thumbnails"
             temp_dir.mkdir(parents=True, exist_ok=True)
             
-            # サムネイルファイル名（ファイル名のハッシュを含めて一意にする）
-            import hashlib
-            file_hash = hashlib.md5(str(file_path).encode()).hexdigest()[:8]
-            thumbnail_name = f"{file_path.stem}_{file_hash}_thumb.jpg"
+            # サムネイルファイル名（パス・更新時刻・サイズのハッシュを含め、動画が上書きされたら作り直す）
+            file_hash = blake2b(
+                f"{file_path}|{stat.st_mtime_ns}|{stat.st_size}".encode(), digest_size=4
+            ).hexdigest()
+            thumbnail_name = f"{file_path.stem}_{file_hash}_{width}w_thumb.jpg"
             thumbnail_path = temp_dir / thumbnail_name
             
             # 既に存在する場合はそれを返す
@@ -805,7 +1521,7 @@ class MediaProcessor:
             
             # 動画の長さを確認して、timestampが長さを超えないようにする
             try:
-                probe = ffmpeg.probe(str(file_path))
+                probe = self._probe(file_path)
                 duration = float(probe['format'].get('duration', 0))
                 if duration > 0:
                     timestamp = min(timestamp, duration - 0.5)  # 最後の0.5秒前まで
@@ -820,19 +1536,7 @@ class MediaProcessor:
                 if thumbnail_path.suffix.lower() != '.jpg':
                     thumbnail_path = thumbnail_path.with_suffix('.jpg')
                 
-                # より確実な方法でサムネイルを生成
-                # subprocessを直接使用してffmpegコマンドを実行
-                cmd = [
-                    'ffmpeg',
-                    '-ss', str(timestamp),
-                    '-i', str(file_path),
-                    '-vf', 'scale=320:-1',
-                    '-vframes', '1',
-                    '-q:v', '2',
-                    '-y',  # 上書き
-                    str(thumbnail_path)
-                ]
-                
+                cmd = self._thumbnail_cmd(file_path, thumbnail_path, timestamp, width)
                 result = subprocess.run(
                     cmd,
                     capture_output=True,
@@ -840,6 +1544,16 @@ class MediaProcessor:
                     text=True
                 )
                 
+                # シーク位置以降にキーフレームがない短いクリップの場合は通常のデコードで再試行
+                if not thumbnail_path.exists() or thumbnail_path.stat().st_size == 0:
+                    cmd = self._thumbnail_cmd(file_path, thumbnail_path, timestamp, width, keyframes_only=False)
+                    result = subprocess.run(
+                        cmd,
+                        capture_output=True,
+                        timeout=10,
+                        text=True
+                    )
+                
                 # 生成されたファイルを確認
                 if thumbnail_path.exists():
                     file_size = thumbnail_path.stat().st_size
@@ -874,6 +1588,10 @@ class MediaProcessor:
                 self.log_callback(f"サムネイル生成エラー ({file_path.name}): {str(e)}", "ERROR")
             return None
     
+    def beat_csv_path(self, audio_file_path: Path) -> Path:
+        """音声ファイルに対応するビートデータCSVのパス（99_Logs/{曲名}_beats.csv）"""
+        return self.logs_dir / f"{audio_file_path.stem}_beats.csv"
+    
     def load_beat_data(self, audio_file_path: Path) -> Optional[dict]:
         """
         音声ファイルに対応するBPMとビートタイミングデータを読み込む
@@ -882,33 +1600,57 @@ class MediaProcessor:
             audio_file_path: 音声ファイルのパス
         
         Returns:
-            BPMとビートタイミングの辞書、またはNone
+            BPMとビートタイミング（numpy配列）の辞書、またはNone
         """
         try:
             # CSVファイル名を生成
-            song_name = audio_file_path.stem
-            csv_filename = f"{song_name}_beats.csv"
-            csv_path = self.logs_dir / csv_filename
+            csv_path = self.beat_csv_path(audio_file_path)
+            csv_filename = csv_path.name
             
-            if not csv_path.exists():
+            try:
+                csv_mtime_ns = csv_path.stat().st_mtime_ns
+            except FileNotFoundError:
                 self.log_callback(f"ビートデータが見つかりません: {csv_filename}", "WARNING")
                 return None
             
-            # CSVを読み込む
-            df = pd.read_csv(csv_path, encoding='utf-8-sig')
-            
-            if 'beat_time_seconds' not in df.columns:
-                self.log_callback(f"ビートデータの形式が正しくありません: {csv_filename}", "ERROR")
-                return None
-            
-            beat_times = df['beat_time_seconds'].tolist()
+            # CSVより新しいキャッシュ（99_Logs/{曲名}_beats.npy）があればCSVを解析せずに読み込む
+            npy_path = csv_path.with_suffix('.npy')
+            beat_times = None
+            try:
+                if npy_path.stat().st_mtime_ns >= csv_mtime_ns:
+                    beat_times = np.load(npy_path, allow_pickle=False)
+            except (OSError, ValueError):
+                beat_times = None
+            
+            if beat_times is None:
+                # CSVを読み込む（ヘッダーで列位置を確認し、ビート時刻の列のみnumpyで読み込む）
+                with open(csv_path, 'r', encoding='utf-8-sig') as f:
+                    header = f.readline().strip().split(',')
+                    if 'beat_time_seconds' not in header:
+                        self.log_callback(f"ビートデータの形式が正しくありません: {csv_filename}", "ERROR")
+                        return None
+                    
+                    column = header.index('beat_time_seconds')
+                    beat_times = np.loadtxt(
+                        f, delimiter=',', usecols=(column,), ndmin=1, dtype=np.float64
+                    )
+                
+                # キャッシュを保存（書き込み途中のファイルを読まないよう一時ファイルから置き換える）
+                tmp_path = npy_path.with_name(npy_path.name + '.tmp')
+                try:
+                    with open(tmp_path, 'wb') as f:
+                        np.save(f, beat_times, allow_pickle=False)
+                    os.replace(tmp_path, npy_path)
+                except OSError:
+                    pass
             
-            # BPMを計算（最初の2ビート間の時間から）
-            if len(beat_times) >= 2:
-                beat_interval = beat_times[1] - beat_times[0]
-                bpm = 60.0 / beat_interval if beat_interval > 0 else 120.0
-            else:
-                bpm = 120.0  # デフォルト値
+            # BPMを計算（全ビート間隔の中央値から。テンポの揺れや検出漏れの影響を抑える）
+            bpm = 120.0  # デフォルト値
+            if beat_times.size >= 2:
+                intervals = np.diff(beat_times)
+                intervals = intervals[intervals > 0]
+                if intervals.size:
+                    bpm = float(60.0 / np.median(intervals))
             
             return {
                 'bpm': bpm,
@@ -943,100 +1685,108 @@ class MediaProcessor:
             # 出力フォルダが存在することを確認
             output_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # 一時ファイルリストを作成（FFmpeg concat demuxer用）
-            import tempfile
-            temp_dir = Path(tempfile.gettempdir()) / "mvai_concat"
-            temp_dir.mkdir(parents=True, exist_ok=True)
-            concat_file = temp_dir / "concat_list.txt"
-            
             # すべてのクリップの解像度とフレームレートを統一
             target_width = 1920
             target_height = 1080
             target_fps = 24
             
-            # 最初のクリップから情報を取得
-            try:
-                first_probe = ffmpeg.probe(str(video_clips[0]))
-                first_video = next((s for s in first_probe['streams'] if s.get('codec_type') == 'video'), None)
-                if first_video:
-                    target_width = int(first_video.get('width', 1920))
-                    target_height = int(first_video.get('height', 1080))
-                    # フレームレートを取得
-                    r_frame_rate = first_video.get('r_frame_rate', '24/1')
-                    if '/' in r_frame_rate:
-                        num, den = map(int, r_frame_rate.split('/'))
-                        target_fps = num / den if den > 0 else 24
-            except:
-                pass
-            
-            # concatファイルをクリア
-            if concat_file.exists():
-                concat_file.unlink()
-            
-            # 各クリップを正規化して一時ファイルに保存
-            normalized_clips = []
-            for i, clip_path in enumerate(video_clips):
+            # 全クリップの動画ストリーム情報を取得（取得できないクリップは除外）
+            clips = []
+            video_streams = []
+            for clip_path in video_clips:
                 try:
-                    normalized_path = temp_dir / f"normalized_{i:04d}.mp4"
-                    
-                    # 解像度とフレームレートを統一
-                    (
-                        ffmpeg
-                        .input(str(clip_path))
-                        .filter('scale', target_width, target_height)
-                        .filter('fps', target_fps)
-                        .output(
-                            str(normalized_path),
-                            vcodec='libx264',
-                            preset='fast',
-                            crf=23,
-                            pix_fmt='yuv420p'
-                        )
-                        .overwrite_output()
-                        .run(quiet=True)
-                    )
-                    
-                    if normalized_path.exists():
-                        normalized_clips.append(normalized_path)
-                        # concatファイルに追加
-                        with open(concat_file, 'a', encoding='utf-8') as f:
-                            f.write(f"file '{normalized_path.absolute()}'\n")
-                    
+                    probe = self._probe(clip_path)
+                    video = next((s for s in probe['streams'] if s.get('codec_type') == 'video'), None)
+                    if video is None:
+                        raise ValueError("動画ストリームがありません")
+                    clips.append(clip_path)
+                    video_streams.append(video)
                 except Exception as e:
-                    self.log_callback(f"クリップの正規化に失敗 ({clip_path.name}): {str(e)}", "ERROR")
-                    continue
+                    self.log_callback(f"クリップの情報取得に失敗 ({clip_path.name}): {str(e)}", "ERROR")
             
-            if not normalized_clips:
-                self.log_callback("正規化されたクリップがありません", "ERROR")
+            if not clips:
+                self.log_callback("結合できるクリップがありません", "ERROR")
                 return False
             
-            # FFmpeg concat demuxerで結合
+            # 最初のクリップから情報を取得
+            first_video = video_streams[0]
             try:
-                (
-                    ffmpeg
-                    .input(str(concat_file), format='concat', safe=0)
-                    .output(
-                        str(output_path),
-                        vcodec='libx264',
-                        preset='medium',
-                        crf=23,
-                        pix_fmt='yuv420p',
-                        movflags='faststart'
-                    )
-                    .overwrite_output()
-                    .run(quiet=True)
-                )
-                
-                # 一時ファイルを削除
-                for clip in normalized_clips:
+                target_width = int(first_video.get('width', 1920))
+                target_height = int(first_video.get('height', 1080))
+                # フレームレートを取得
+                r_frame_rate = first_video.get('r_frame_rate', '24/1')
+                if '/' in r_frame_rate:
+                    num, den = map(int, r_frame_rate.split('/'))
+                    target_fps = num / den if den > 0 else 24
+            except (ValueError, TypeError):
+                pass
+            
+            # H.264（yuv420p）でプロファイル・レベル・解像度・フレームレートなどがすべて同じ場合は
+            # 再エンコードせずに連結できる（WMV・FLVなどのコーデックはmp4にコピーできない）
+            def stream_format(video):
+                return tuple(video.get(key) for key in (
+                    'codec_name', 'profile', 'level', 'width', 'height', 'r_frame_rate', 'pix_fmt', 'time_base'
+                ))
+            
+            formats = {stream_format(video) for video in video_streams}
+            same_format = (
+                len(formats) == 1
+                and first_video.get('codec_name') == 'h264'
+                and first_video.get('pix_fmt') == 'yuv420p'
+            )
+            
+            temp_dir = Path(tempfile.gettempdir()) / "mvai_concat"
+            concat_file = None
+            try:
+                copied = False
+                if same_format:
+                    # FFmpeg concat demuxerでストリームをコピーして結合
+                    temp_dir.mkdir(parents=True, exist_ok=True)
+                    with tempfile.NamedTemporaryFile(
+                        'w', encoding='utf-8', suffix='.txt', dir=temp_dir, delete=False
+                    ) as f:
+                        concat_file = Path(f.name)
+                        f.write("".join(f"file '{clip.absolute()}'\n" for clip in clips))
                     try:
-                        clip.unlink()
-                    except:
-                        pass
-                try:
-                    concat_file.unlink()
-                except:
-                    pass
+                        (
+                            ffmpeg
+                            .input(str(concat_file), format='concat', safe=0)
+                            .output(
+                                str(output_path),
+                                an=None,
+                                vcodec='copy',
+                                movflags='faststart'
+                            )
+                            .overwrite_output()
+                            .run(quiet=True)
+                        )
+                        copied = True
+                    except ffmpeg.Error:
+                        self.log_callback("ストリームのコピーで結合できないため、再エンコードして結合します", "WARNING")
+                
+                if not copied:
+                    # 解像度とフレームレートを統一し、concatフィルターで1回のエンコードで結合
+                    # （GPUのハードウェアエンコーダーがあれば優先し、失敗時はlibx264で再実行）
+                    normalized = [
+                        ffmpeg.input(str(clip)).video
+                        .filter('scale', target_width, target_height)
+                        .filter('setsar', 1)
+                        .filter('fps', fps=target_fps)
+                        for clip in clips
+                    ]
+                    self._run_encode(
+                        lambda encoder_args: (
+                            ffmpeg
+                            .concat(*normalized, v=1, a=0)
+                            .output(
+                                str(output_path),
+                                pix_fmt='yuv420p',
+                                movflags='faststart',
+                                **encoder_args
+                            )
+                        ),
+                        self._standard_encoder_args
+                    )
                 
                 if output_path.exists() and output_path.stat().st_size > 0:
                     file_size = output_path.stat().st_size / (1024*1024)
@@ -1058,14 +1808,20 @@ class MediaProcessor:
                         error_msg = str(e.stderr)
                 self.log_callback(f"動画結合エラー: {error_msg[:300]}", "ERROR")
                 return False
+            finally:
+                # 一時ファイルを削除
+                if concat_file is not None:
+                    try:
+                        concat_file.unlink()
+                    except OSError:
+                        pass
                 
         except Exception as e:
-            import traceback
             self.log_callback(f"動画結合エラー: {str(e)}\n{traceback.format_exc()[:500]}", "ERROR")
             return False
     
     def create_mv_from_clips(self, video_clips: List[Path], audio_path: Path, 
-                            output_path: Path, sync_to_beat: bool = True) -> bool:
+                            output_path: Path, sync_to_beat: bool = True) -> Optional[dict]:
         """
         複数の動画クリップと音声からMVを生成（ビート同期対応）
         
@@ -1076,7 +1832,8 @@ class MediaProcessor:
             sync_to_beat: ビートに同期するかどうか
         
         Returns:
-            成功した場合True、失敗した場合False
+            生成したMVの情報（output_path、size_bytes、width、height、duration）の辞書、
+            失敗した場合はNone（生成時に取得済みの情報を返すため、呼び出し側で再度probeする必要はありません）
         """
         try:
             self.log_callback(f"MV生成を開始: {len(video_clips)}個のクリップ", "INFO")
@@ -1084,20 +1841,19 @@ class MediaProcessor:
             # 音声ファイルの存在確認
             if not audio_path.exists():
                 self.log_callback(f"音声ファイルが見つかりません: {audio_path.name}", "ERROR")
-                return False
+                return None
             
             # 音声の長さを取得
             try:
-                audio_probe = ffmpeg.probe(str(audio_path))
+                audio_probe = self._probe(audio_path)
                 audio_duration = float(audio_probe['format'].get('duration', 0))
             except:
                 audio_duration = 0
             
             if audio_duration <= 0:
                 self.log_callback("音声の長さを取得できませんでした", "ERROR")
-                return False
+                return None
             
-            import tempfile
             temp_dir = Path(tempfile.gettempdir()) / "mvai_mv"
             temp_dir.mkdir(parents=True, exist_ok=True)
             
@@ -1111,16 +1867,33 @@ class MediaProcessor:
                     self.log_callback("ビートデータが見つかりません。通常の結合を行います。", "WARNING")
                     sync_to_beat = False
             
-            # 各クリップの長さを取得
+            # 各クリップの長さを取得（出力の解像度・フレームレートは最初の有効なクリップに合わせる）
             clip_durations = []
+            target_video = None
             for clip in video_clips:
                 try:
-                    probe = ffmpeg.probe(str(clip))
-                    duration = float(probe['format'].get('duration', 0))
+                    duration, video = self._probe_clip(clip)
                     clip_durations.append(duration)
+                    if target_video is None and duration > 0:
+                        target_video = video
                 except:
                     clip_durations.append(0)
             
+            if target_video is None:
+                self.log_callback("有効な動画クリップがありません", "ERROR")
+                return None
+            
+            target_width = int(target_video.get('width', 1920))
+            target_height = int(target_video.get('height', 1080))
+            target_fps = 24
+            r_frame_rate = target_video.get('r_frame_rate', '24/1')
+            try:
+                if '/' in r_frame_rate:
+                    num, den = map(int, r_frame_rate.split('/'))
+                    target_fps = num / den if den > 0 else 24
+            except ValueError:
+                pass
+            
             # ビート同期でクリップを配置
             if sync_to_beat and beat_data:
                 # ビートタイミングに合わせてクリップを配置
@@ -1179,6 +1952,10 @@ class MediaProcessor:
                     clip = video_clips[clip_index % len(video_clips)]
                     clip_duration = clip_durations[clip_index % len(video_clips)]
                     
+                    if clip_duration <= 0:
+                        clip_index += 1
+                        continue
+                    
                     remaining = audio_duration - current_time
                     use_duration = min(clip_duration, remaining)
                     
@@ -1194,121 +1971,72 @@ class MediaProcessor:
                 
                 self.log_callback(f"通常結合: {len(clip_segments)}個のセグメントを生成", "INFO")
             
+            # 映像の合計が音声より短い場合は、クリップを順番に追加して音声の長さ以上にする
+            # （超過分は最終出力で音声の長さに切り捨てる）
+            total_duration = sum(segment['duration'] for segment in clip_segments)
+            valid_clips = [(clip, d) for clip, d in zip(video_clips, clip_durations) if d > 0]
+            clip_index = 0
+            while total_duration < audio_duration:
+                clip, clip_duration = valid_clips[clip_index % len(valid_clips)]
+                use_duration = min(clip_duration, audio_duration - total_duration)
+                clip_segments.append({
+                    'clip': clip,
+                    'start_time': 0.0,
+                    'duration': use_duration,
+                    'output_start': total_duration
+                })
+                total_duration += use_duration
+                clip_index += 1
+            
             # セグメントから動画を生成
+            # 各セグメントを同じ解像度・フレームレート・エンコード設定で1回だけエンコードし、
+            # 結合と音声の多重化は再エンコードせずに1回のffmpeg呼び出しで行う
+            work_dir = Path(tempfile.mkdtemp(dir=temp_dir))
             try:
-                # 各セグメントを処理
+                # 各セグメントを処理（GPUのハードウェアエンコーダーがあれば優先し、失敗時はlibx264で再実行）
                 segment_files = []
+                segment_encoders = set()
                 for i, segment in enumerate(clip_segments):
-                    segment_file = temp_dir / f"segment_{i:04d}.mp4"
+                    segment_file = work_dir / f"segment_{i:04d}.mp4"
                     
                     # クリップからセグメントを抽出
-                    (
+                    segment_stream = (
                         ffmpeg
-                        .input(str(segment['clip']), ss=segment['start_time'])
-                        .output(
-                            str(segment_file),
-                            t=segment['duration'],
-                            vcodec='libx264',
-                            preset='fast',
-                            crf=23,
-                            pix_fmt='yuv420p'
-                        )
-                        .overwrite_output()
-                        .run(quiet=True)
+                        .input(str(segment['clip']), ss=segment['start_time'], t=segment['duration'])
+                        .video
+                        .filter('scale', target_width, target_height)
+                        .filter('setsar', 1)
+                        .filter('fps', fps=target_fps)
+                    )
+                    encoder = self._run_encode(
+                        lambda encoder_args: segment_stream.output(
+                            str(segment_file), pix_fmt='yuv420p', **encoder_args
+                        ),
+                        self._standard_encoder_args
                     )
                     
                     if segment_file.exists():
                         segment_files.append(segment_file)
+                        segment_encoders.add(encoder)
                 
                 if not segment_files:
                     self.log_callback("セグメントファイルが生成されませんでした", "ERROR")
-                    return False
-                
-                if not segment_files:
-                    self.log_callback("有効なセグメントファイルがありません", "ERROR")
-                    return False
+                    return None
                 
-                # セグメントを結合
-                concat_file = temp_dir / "concat_list.txt"
+                # セグメントの結合と音声の多重化（映像はコピーし、音声の長さで切り捨てる）
+                concat_file = work_dir / "concat_list.txt"
                 with open(concat_file, 'w', encoding='utf-8') as f:
-                    for seg_file in segment_files:
-                        f.write(f"file '{seg_file.absolute()}'\n")
+                    f.write("".join(f"file '{seg_file.absolute()}'\n" for seg_file in segment_files))
                 
-                combined_video = temp_dir / "combined_video.mp4"
-                
-                # 結合された動画の長さを確認
-                try:
-                    (
-                        ffmpeg
-                        .input(str(concat_file), format='concat', safe=0)
-                        .output(
-                            str(combined_video),
-                            vcodec='libx264',
-                            preset='medium',
-                            crf=23,
-                            pix_fmt='yuv420p',
-                            movflags='faststart'
-                        )
-                        .overwrite_output()
-                        .run(quiet=True)
-                    )
-                except ffmpeg.Error as e:
-                    error_msg = ""
-                    if e.stderr:
-                        try:
-                            error_msg = e.stderr.decode('utf-8', errors='ignore')
-                        except:
-                            error_msg = str(e.stderr)
-                    self.log_callback(f"動画結合エラー: {error_msg[:300]}", "ERROR")
-                    return False
-                
-                # 結合された動画の長さを確認し、音声の長さに合わせる
-                try:
-                    combined_probe = ffmpeg.probe(str(combined_video))
-                    combined_duration = float(combined_probe['format'].get('duration', 0))
-                    
-                    if combined_duration < audio_duration:
-                        # 動画が短い場合は、最後のセグメントを繰り返す
-                        final_segment = segment_files[-1]
-                        loop_count = int((audio_duration - combined_duration) / (segment_files[-1].stat().st_size / (1024*1024) * 0.1)) + 1
-                        # シンプルに最後のセグメントを追加
-                        with open(concat_file, 'a', encoding='utf-8') as f:
-                            for _ in range(int((audio_duration - combined_duration) / 2) + 1):
-                                f.write(f"file '{final_segment.absolute()}'\n")
-                        
-                        # 再結合
-                        (
-                            ffmpeg
-                            .input(str(concat_file), format='concat', safe=0)
-                            .output(
-                                str(combined_video),
-                                vcodec='libx264',
-                                preset='medium',
-                                crf=23,
-                                pix_fmt='yuv420p',
-                                movflags='faststart',
-                                t=audio_duration
-                            )
-                            .overwrite_output()
-                            .run(quiet=True)
-                        )
-                    elif combined_duration > audio_duration:
-                        # 動画が長い場合はトリミング
-                        trimmed_video = temp_dir / "trimmed_combined.mp4"
-                        (
-                            ffmpeg
-                            .input(str(combined_video))
-                            .output(str(trimmed_video), t=audio_duration, vcodec='copy')
-                            .overwrite_output()
-                            .run(quiet=True)
-                        )
-                        combined_video = trimmed_video
-                except:
-                    pass
+                video_stream = ffmpeg.input(str(concat_file), format='concat', safe=0).video
+                audio_stream = ffmpeg.input(str(audio_path)).audio
                 
-                # 動画と音声を結合
-                video_stream = ffmpeg.input(str(combined_video))
-                audio_stream = ffmpeg.input(str(audio_path))
+                # 途中でハードウェアエンコーダーからlibx264に切り替わった場合はセグメントの
+                # エンコード設定が揃わずストリームコピーで結合できないため、libx264で再エンコードする
+                if len(segment_encoders) > 1:
+                    video_args = dict(self._standard_encoder_args(None), pix_fmt='yuv420p')
+                else:
+                    video_args = {'vcodec': 'copy'}
                 
                 (
                     ffmpeg
@@ -1316,34 +2044,34 @@ class MediaProcessor:
                         video_stream,
                         audio_stream,
                         str(output_path),
-                        vcodec='copy',
                         acodec='aac',
-                        strict='experimental',
-                        movflags='faststart'
+                        t=audio_duration,
+                        shortest=None,
+                        movflags='faststart',
+                        **video_args
                     )
                     .overwrite_output()
                     .run(quiet=True)
                 )
                 
-                # 一時ファイルを削除
-                try:
-                    for seg_file in segment_files:
-                        seg_file.unlink()
-                    combined_video.unlink()
-                    concat_file.unlink()
-                except:
-                    pass
-                
-                if output_path.exists() and output_path.stat().st_size > 0:
-                    file_size = output_path.stat().st_size / (1024*1024)
+                size_bytes = output_path.stat().st_size if output_path.exists() else 0
+                if size_bytes > 0:
+                    file_size = size_bytes / (1024*1024)
                     self.log_callback(
                         f"✅ MV生成完了: {output_path.name} ({file_size:.2f} MB)",
                         "SUCCESS"
                     )
-                    return True
+                    # 映像は音声の長さ以上のセグメントを結合して音声の長さで切り捨てているため、長さは音声と同じ
+                    return {
+                        'output_path': output_path,
+                        'size_bytes': size_bytes,
+                        'width': target_width,
+                        'height': target_height,
+                        'duration': audio_duration
+                    }
                 else:
                     self.log_callback("MVファイルが生成されませんでした", "ERROR")
-                    return False
+                    return None
                     
             except ffmpeg.Error as e:
                 error_msg = ""
@@ -1353,10 +2081,12 @@ class MediaProcessor:
                     except:
                         error_msg = str(e.stderr)
                 self.log_callback(f"MV生成エラー: {error_msg[:300]}", "ERROR")
-                return False
+                return None
+            finally:
+                # 一時ファイルを削除
+                shutil.rmtree(work_dir, ignore_errors=True)
                 
         except Exception as e:
-            import traceback
             self.log_callback(f"MV生成エラー: {str(e)}\n{traceback.format_exc()[:500]}", "ERROR")
-            return False
+            return None
 
@@ -7,6 +7,8 @@ from pathlib import Path
 from typing import List, Dict, Optional
 from datetime import datetime
 
+from json_utils import dump_json
+
 
 class PromptHistory:
     """プロンプト履歴管理クラス"""
@@ -74,8 +76,7 @@ class PromptHistory:
     def save_history(self, history: List[Dict]) -> bool:
         """履歴を保存"""
         try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
+            dump_json(history, self.history_file)
             return True
         except Exception as e:
             print(f"プロンプト履歴の保存に失敗: {str(e)}")
@@ -124,8 +125,7 @@ class PromptHistory:
     def save_favorites(self, favorites: List[Dict]) -> bool:
         """お気に入りを保存"""
         try:
-            with open(self.favorites_file, 'w', encoding='utf-8') as f:
-                json.dump(favorites, f, ensure_ascii=False, indent=2)
+            dump_json(favorites, self.favorites_file)
             return True
         except Exception as e:
             print(f"お気に入りの保存に失敗: {str(e)}")